@@ -0,0 +1,116 @@
+"""
+Compression benchmark for the Fieldwork Model Serialiser Step.
+
+Compresses existing .geof, .ens and .mesh files with every codec and
+level given, through the same compression.compress_file used by
+save_model, and reports bytes written against CPU time. Point it at the
+output of a real workflow; without paths it writes a synthetic model.
+Results are written as JSON.
+
+    python benchmarks/compression.py path/to/models --levels 1 6 9 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from serialise import SyntheticGeometricField, _install_mapclient_stand_in
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the plugin package imports the step, which needs MAP Client.
+_install_mapclient_stand_in()
+
+from mapclientplugins.fieldworkmodelserialiserstep.compression import COMPRESSIONS, compress_file  # noqa: E402
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import TEXT_EXTENSIONS  # noqa: E402
+
+LEVELS = {'gzip': range(0, 10), 'bz2': range(1, 10), 'lzma': range(0, 10)}
+
+
+def find_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(TEXT_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def synthetic_files(location, nodes):
+    # As with gias3, the .geof and .ens are opened as given and only the mesh is written under location.
+    filename = os.path.join(location, 'synthetic')
+    SyntheticGeometricField(nodes).save_geometric_field(filename, filename, 'synthetic', location)
+    return find_files([location])
+
+
+def run_case(files, compression, level, scratch):
+    inputBytes = outputBytes = 0
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for index, filename in enumerate(files):
+        target = os.path.join(scratch, str(index))
+        compress_file(filename, target, compression, level)
+        inputBytes += os.path.getsize(filename)
+        outputBytes += os.path.getsize(target)
+        os.remove(target)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    return {
+        'compression': compression,
+        'level': level,
+        'files': len(files),
+        'input_bytes': inputBytes,
+        'output_bytes': outputBytes,
+        'ratio': inputBytes / float(outputBytes) if outputBytes else None,
+        'cpu_seconds': cpu,
+        'wall_seconds': wall,
+        'input_megabytes_per_cpu_second': inputBytes / cpu / 1e6 if cpu else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='model files or directories searched for them')
+    parser.add_argument('--compressions', nargs='+', choices=COMPRESSIONS[1:], default=COMPRESSIONS[1:])
+    parser.add_argument('--levels', type=int, nargs='+', default=None, help='levels to try, default all')
+    parser.add_argument('--nodes', type=int, default=100000, help='nodes of the synthetic model')
+    parser.add_argument('--output', default=None, help='JSON results file, default stdout')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='fieldwork-compression-')
+    try:
+        files = find_files(args.paths) if args.paths else synthetic_files(scratch, args.nodes)
+        results = []
+        for compression in args.compressions:
+            for level in args.levels or LEVELS[compression]:
+                if level not in LEVELS[compression]:
+                    continue
+                result = run_case(files, compression, level, scratch)
+                print('{compression:>5} {level}: {output_bytes:>12} bytes, ratio {ratio:6.2f}, '
+                      '{cpu_seconds:8.3f} s CPU'.format(**result), file=sys.stderr)
+                results.append(result)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'synthetic': not args.paths,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == '__main__':
+    main()
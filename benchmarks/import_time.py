@@ -0,0 +1,60 @@
+"""
+Import-time benchmark for the Fieldwork Model Serialiser Step plugin.
+
+MAP Client imports every plugin package when it discovers plugins, so
+importing the package must stay cheap and must not load the Qt widgets
+or the configuration dialog. MAP Client itself imports PySide6.QtCore
+for the step base class, so that is not counted. This script
+imports the package in fresh interpreters, reports the median import
+time, and exits with status 1 if a GUI module was loaded or the median
+exceeds --max-ms.
+
+    python benchmarks/import_time.py --repeat 10 --max-ms 500
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PACKAGE = 'mapclientplugins.fieldworkmodelserialiserstep'
+GUI_MODULES = ('PySide6.QtWidgets', 'PySide6.QtGui', PACKAGE + '.configuredialog', PACKAGE + '.ui_configuredialog')
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {package}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'gui': sorted(m for m in {gui!r} if m in sys.modules)}}))
+'''
+
+
+def measure():
+    output = subprocess.check_output([sys.executable, '-c', _PROBE.format(package=PACKAGE, gui=GUI_MODULES)])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters to time')
+    parser.add_argument('--max-ms', type=float, default=None, help='fail if the median import time is above this')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    median_ms = statistics.median(run['seconds'] for run in runs) * 1000
+    gui = sorted(set(m for run in runs for m in run['gui']))
+    print(json.dumps({'package': PACKAGE, 'repeat': args.repeat, 'median_ms': median_ms, 'gui_modules': gui}))
+
+    failed = False
+    if gui:
+        print('GUI modules loaded at import: ' + ', '.join(gui), file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print('median import time {:.1f} ms exceeds {:.1f} ms'.format(median_ms, args.max_ms), file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
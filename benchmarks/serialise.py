@@ -0,0 +1,242 @@
+"""
+Serialisation benchmarks for the Fieldwork Model Serialiser Step.
+
+Drives FieldworkModelSerialiserStep.setPortData and execute with
+synthetic GeometricField stand-ins, so neither gias3, a GUI nor (if it
+is not installed) MAP Client is needed. Each case is one output mode at
+one model size, and reports latency percentiles of execute, throughput
+and peak traced memory. Results are written as JSON.
+
+    python benchmarks/serialise.py --nodes 1000 100000 --modes geof npz --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    # name: (config overrides, number of models per execution)
+    'geof': ({'Atomic Write': False, 'Durability': 'none'}, 1),
+    'atomic': ({'Durability': 'none'}, 1),
+    'group-fsync': ({'Durability': 'group'}, 1),
+    'file-fsync': ({'Durability': 'file'}, 1),
+    'npz': ({'Output Format': 'npz'}, 1),
+    'npy': ({'Output Format': 'npy'}, 1),
+    'gzip': ({'Compression': 'gzip'}, 1),
+    'async': ({'Asynchronous Write': True, 'Writer Threads': 2}, 1),
+    'process': ({'Asynchronous Write': True, 'Writer Process': True}, 1),
+    'batch': ({'Output Format': 'npy', 'Batch Workers': 4}, 8),
+}
+
+
+def _install_mapclient_stand_in():
+    """
+    Provide the one MAP Client class the step needs when MAP Client is
+    not installed.
+    """
+    try:
+        import mapclient.mountpoints.workflowstep  # noqa: F401
+        return False
+    except ImportError:
+        pass
+
+    class WorkflowStepMountPoint(object):
+        def __init__(self, name, location):
+            self._name = name
+            self._location = location
+            self._ports = []
+
+        def addPort(self, triple):
+            self._ports.append(triple)
+
+        def _doneExecution(self):
+            pass
+
+    modules = {}
+    for name in ('mapclient', 'mapclient.mountpoints', 'mapclient.mountpoints.workflowstep'):
+        modules[name] = types.ModuleType(name)
+    modules['mapclient.mountpoints.workflowstep'].WorkflowStepMountPoint = WorkflowStepMountPoint
+    sys.modules.update(modules)
+    return True
+
+
+if __name__ == '__mp_main__':
+    # Writer processes are spawned and import this script, but not main().
+    _install_mapclient_stand_in()
+
+
+class SyntheticMesh(object):
+
+    def __init__(self, elements):
+        self.elements = dict((i, (i, i + 1, i + 2)) for i in range(elements))
+
+    def save_mesh(self, filename, path=None):
+        with open(os.path.join(path or '', filename + '.mesh'), 'w') as f:
+            for element, nodes in self.elements.items():
+                f.write('{} {}\n'.format(element, ' '.join(str(n) for n in nodes)))
+
+
+class SyntheticEnsemble(object):
+
+    def __init__(self, elements):
+        self.mesh = SyntheticMesh(elements)
+
+    def save_ensemble(self, filename, mesh_filename=None, path=None):
+        # As in gias3, the .ens is opened as given and only the mesh is
+        # written under path.
+        with open(filename + '.ens', 'w') as f:
+            f.write('quad_L2 {}\n'.format(os.path.basename(mesh_filename or '')))
+        if mesh_filename is not None:
+            self.mesh.save_mesh(mesh_filename, path)
+
+
+class SyntheticGeometricField(object):
+    """
+    Stands in for a gias3 GeometricField, with the attributes the step
+    reads to stream a .geof file itself. save_geometric_field, used
+    where the step falls back to gias3, writes one line of
+    full-precision coordinates per node. Filenames are handled as gias3
+    handles them: the .geof and .ens are opened as given, and only the
+    mesh is joined with path.
+    """
+
+    def __init__(self, nodes, ensemble=None, seed=0):
+        self.name = 'synthetic'
+        self.dimensions = 3
+        self.ensemble_point_counter = nodes
+        self.field_parameters = np.random.default_rng(seed).random((3, nodes, 1))
+        self.ensemble_field_function = ensemble or SyntheticEnsemble(max(1, nodes // 16))
+
+    def save_geometric_field(self, gf_filename, ensemble_filename=None, mesh_filename=None, path=None):
+        np.savetxt(gf_filename + '.geof',
+                   self.field_parameters.reshape(self.field_parameters.shape[0], -1).T, fmt='%.17g')
+        if ensemble_filename is not None:
+            self.ensemble_field_function.save_ensemble(ensemble_filename, mesh_filename, path)
+        elif mesh_filename is not None:
+            self.ensemble_field_function.mesh.save_mesh(mesh_filename, path)
+
+
+def make_step(location, config):
+    from mapclientplugins.fieldworkmodelserialiserstep.step import FieldworkModelSerialiserStep
+
+    step = FieldworkModelSerialiserStep(location)
+    if hasattr(step, 'registerDoneExecution'):
+        step.registerDoneExecution(lambda: None)
+    step._config.update({'identifier': 'benchmark', 'GF Filename': 'model',
+                         'Ensemble Filename': 'model', 'Mesh Filename': 'model', 'Path': location})
+    step._config.update(config)
+    return step
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[index]
+
+
+def directory_bytes(location):
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(location) for f in files
+               if not os.path.islink(os.path.join(root, f)))
+
+
+def run_case(mode, nodes, repeat):
+    from mapclientplugins.fieldworkmodelserialiserstep.durability import commit_all
+
+    config, models = MODES[mode]
+    ensemble = SyntheticEnsemble(max(1, nodes // 16))
+    location = tempfile.mkdtemp(prefix='fieldwork-benchmark-')
+    try:
+        step = make_step(location, config)
+        if models > 1:
+            step.setPortData(5, [SyntheticGeometricField(nodes, ensemble, seed) for seed in range(models)])
+        else:
+            step.setPortData(0, SyntheticGeometricField(nodes, ensemble))
+
+        latencies = []
+        tracemalloc.start()
+        start = time.perf_counter()
+        for iteration in range(repeat):
+            step.setPortData(1, 'model_{}'.format(iteration))
+            executeStart = time.perf_counter()
+            step.execute()
+            latencies.append(time.perf_counter() - executeStart)
+        step.flush()
+        # Group commits still pending are part of the cost of the writes.
+        commit_all()
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        written = directory_bytes(location)
+        return {
+            'mode': mode,
+            'nodes': nodes,
+            'models_per_execution': models,
+            'executions': repeat,
+            'latency_ms': {
+                'p50': percentile(latencies, 50) * 1000,
+                'p90': percentile(latencies, 90) * 1000,
+                'p99': percentile(latencies, 99) * 1000,
+                'mean': statistics.mean(latencies) * 1000,
+            },
+            'total_seconds': total,
+            'models_per_second': repeat * models / total,
+            'bytes_written': written,
+            'megabytes_per_second': written / total / 1e6,
+            'peak_traced_bytes': peak,
+        }
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=sorted(MODES))
+    parser.add_argument('--repeat', type=int, default=5, help='executions per case')
+    parser.add_argument('--output', default=None, help='JSON results file, default stdout')
+    args = parser.parse_args()
+
+    standIn = _install_mapclient_stand_in()
+    from mapclientplugins.fieldworkmodelserialiserstep import __version__
+
+    results = []
+    for nodes in args.nodes:
+        for mode in args.modes:
+            result = run_case(mode, nodes, args.repeat)
+            print('{mode:>11} {nodes:>8} nodes: p50 {p50:8.2f} ms, {models_per_second:8.2f} models/s, '
+                  '{megabytes_per_second:8.2f} MB/s, peak {peak:8.1f} MB'.format(
+                      p50=result['latency_ms']['p50'], peak=result['peak_traced_bytes'] / 1e6, **result),
+                  file=sys.stderr)
+            results.append(result)
+
+    report = {
+        'plugin_version': __version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'mapclient_stand_in': standIn,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Append-only archive holding many serialised models in one file.
+
+Each model is a record: a magic number, a JSON header naming the record
+and its members (the .geof/.npz/.npy, .ens and .mesh files), then the
+member bytes. An index of record offsets is written as a footer on every
+flush and cut off before the next append. If a writer dies before
+flushing, readers rebuild the index by scanning the records, so only the
+last partial record is lost.
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+RECORD_MAGIC = b'FWR1'
+FOOTER_MAGIC = b'FWX1'
+END_MAGIC = b'FWE1'
+_LENGTH = struct.Struct('<I')
+_OFFSET = struct.Struct('<Q')
+
+
+def stage_model(gf, gfFilename, ensFilename=None, meshFilename=None, **options):
+    """
+    Write gf into a new temporary directory through save_model, using
+    only the base names of the filenames. The caller appends the files
+    to an archive and then removes result['staging']. Checksum
+    sidecars are not written, as they would not reach the archive, and
+    the staged files are neither renamed into place nor fsynced, as
+    they are removed once appended.
+    """
+    options['checksum'] = None
+    options['atomic'] = False
+    options['durability'] = 'none'
+    staging = tempfile.mkdtemp(prefix='fieldwork-archive-')
+    try:
+        names = [None if f is None else os.path.join(staging, os.path.basename(f))
+                 for f in (gfFilename, ensFilename, meshFilename)]
+        result = save_model(gf, names[0], names[1], names[2], '', **options)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    result['staging'] = staging
+    return result
+
+
+def _read_index(f):
+    """
+    Return (index, dataEnd) for an open archive, where index is a list
+    of (name, offset) pairs in the order the records were appended.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    tail = _OFFSET.size + len(END_MAGIC)
+    if size >= tail:
+        f.seek(size - tail)
+        offset = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+        if f.read(len(END_MAGIC)) == END_MAGIC and offset < size - tail:
+            f.seek(offset)
+            if f.read(len(FOOTER_MAGIC)) == FOOTER_MAGIC:
+                index = json.loads(f.read(size - tail - offset - len(FOOTER_MAGIC)).decode('utf-8'))
+                return [tuple(entry) for entry in index], offset
+
+    # No valid footer, scan the records.
+    index = []
+    position = 0
+    while True:
+        f.seek(position)
+        header = _read_header(f, size)
+        if header is None:
+            return index, position
+        end = f.tell() + sum(length for _, length in header['members'])
+        if end > size:
+            return index, position
+        index.append((header['name'], position))
+        position = end
+
+
+def _read_header(f, size):
+    start = f.tell()
+    if start + len(RECORD_MAGIC) + _LENGTH.size > size or f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+        return None
+    length = _LENGTH.unpack(f.read(_LENGTH.size))[0]
+    if f.tell() + length > size:
+        return None
+    return json.loads(f.read(length).decode('utf-8'))
+
+
+class ArchiveReader(object):
+    """
+    Random access to the records of an archive by name. If a name was
+    appended more than once the latest record is returned.
+    """
+
+    def __init__(self, filename):
+        self._f = open(filename, 'rb')
+        index, _ = _read_index(self._f)
+        self._size = os.path.getsize(filename)
+        self._offsets = dict(index)
+        self._names = [name for name, _ in index]
+
+    def names(self):
+        return list(self._names)
+
+    def read(self, name):
+        """
+        Return a dict mapping each member filename of the record to its bytes.
+        """
+        self._f.seek(self._offsets[name])
+        header = _read_header(self._f, self._size)
+        return dict((member, self._f.read(length)) for member, length in header['members'])
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ModelArchive(object):
+    """
+    Appends records to an archive file, creating it if needed. The
+    index footer is rewritten every flushEvery records and on close.
+    A record name that is already in the archive gets an '@n' suffix.
+    """
+
+    def __init__(self, filename, flushEvery=16):
+        self.filename = filename
+        self.flushEvery = flushEvery
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        if os.path.exists(filename):
+            self._f = open(filename, 'r+b')
+            index, self._dataEnd = _read_index(self._f)
+        else:
+            self._f = open(filename, 'w+b')
+            index, self._dataEnd = [], 0
+        self._index = index
+        self._counts = {}
+        for name, _ in index:
+            base = name.split('@')[0]
+            self._counts[base] = self._counts.get(base, 0) + 1
+
+    def append(self, name, files):
+        """
+        Append a record holding files, stored under their base names.
+        Returns the name the record was stored under.
+        """
+        members = [(os.path.basename(f), os.path.getsize(f)) for f in files]
+        with self._lock:
+            count = self._counts.get(name, 0)
+            self._counts[name] = count + 1
+            if count:
+                name = '{}@{}'.format(name, count)
+
+            header = json.dumps({'name': name, 'members': members}).encode('utf-8')
+            # Drop any footer first, so that a record cut short by a crash
+            # ends the file, and the scan does not read old footer bytes as
+            # the rest of it.
+            self._f.truncate(self._dataEnd)
+            self._f.seek(self._dataEnd)
+            self._f.write(RECORD_MAGIC)
+            self._f.write(_LENGTH.pack(len(header)))
+            self._f.write(header)
+            for filename in files:
+                with open(filename, 'rb') as source:
+                    shutil.copyfileobj(source, self._f)
+            self._index.append((name, self._dataEnd))
+            self._dataEnd = self._f.tell()
+
+            self._unflushed += 1
+            if self._unflushed >= self.flushEvery:
+                self._flush()
+        return name
+
+    def append_staged(self, name, result):
+        """
+        Append the files of a stage_model result and remove its staging
+        directory.
+        """
+        try:
+            return self.append(name, result['files'])
+        finally:
+            shutil.rmtree(result['staging'], ignore_errors=True)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._f.seek(self._dataEnd)
+        self._f.write(FOOTER_MAGIC)
+        self._f.write(json.dumps(self._index).encode('utf-8'))
+        self._f.write(_OFFSET.pack(self._dataEnd))
+        self._f.write(END_MAGIC)
+        self._f.truncate()
+        self._f.flush()
+        self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            if self._f.closed:
+                return
+            self._flush()
+            self._f.close()
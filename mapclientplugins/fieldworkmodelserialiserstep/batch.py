@@ -0,0 +1,127 @@
+"""
+Batch serialisation of a population of fieldwork models. Each model is
+written through serialiser.save_model on a thread or process pool, with
+filenames generated from a template.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from mapclientplugins.fieldworkmodelserialiserstep.archive import stage_model
+from mapclientplugins.fieldworkmodelserialiserstep.durability import commit_all
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import output_paths, save_model
+
+POOL_TYPES = ('thread', 'process')
+
+
+def iter_models(models):
+    """
+    Yield (name, gf) pairs from a dict of GeometricFields keyed by name,
+    or from a list, in which case the name is the list index.
+    """
+    if isinstance(models, dict):
+        for name, gf in models.items():
+            yield str(name), gf
+    else:
+        for index, gf in enumerate(models):
+            yield str(index), gf
+
+
+def batch_filename(template, filename, name, index):
+    """
+    Expand template for one model. The template may use {filename}
+    (the configured filename), {name} and {index}. Returns None if
+    filename is None.
+    """
+    if filename is None:
+        return None
+    return template.format(filename=filename, name=name, index=index)
+
+
+def _save_and_commit(fn, *args, **kwargs):
+    """
+    Run fn in a pool process, then fsync any group commit it left
+    pending, as neither the commit timer nor atexit runs in pool
+    processes.
+    """
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        commit_all()
+
+
+def save_batch(models, gfFilename, ensFilename, meshFilename, path, template,
+               workers=1, pool='thread', fingerprints=None, archive=None, **options):
+    """
+    Write every model in models and return (results, summary). results
+    maps each model name to the dict returned by save_model, or to
+    {'error': message} if the write failed. summary holds the totals
+    and throughput of the whole batch. If a FingerprintCache or
+    WriteJournal is given, models whose parameters have not changed
+    are skipped. If a
+    ModelArchive is given, each model is written to a staging directory
+    by the pool and appended to the archive as it completes, and its
+    result has the record name under 'record'. Any other keyword
+    arguments are passed on to save_model.
+    """
+    if pool not in POOL_TYPES:
+        raise ValueError('Unknown batch pool type: ' + str(pool))
+
+    if pool == 'process':
+        # Pool processes are started fresh rather than forked from a
+        # process that may be running the MAP Client GUI or writer threads.
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    start = time.perf_counter()
+    futures = {}
+    results = {}
+    with executor:
+        for index, (name, gf) in enumerate(iter_models(models)):
+            modelFilename = batch_filename(template, gfFilename, name, index)
+            gfPath = output_paths(modelFilename, None, None, path, options.get('fmt', 'geof'),
+                                  options.get('compression', 'none'))[0]
+            if fingerprints is not None and fingerprints.unchanged(gfPath, gf.field_parameters):
+                results[name] = {'skipped': True, 'files': [gfPath], 'bytes': 0, 'seconds': 0.0}
+                continue
+
+            args = (gf, modelFilename,
+                    batch_filename(template, ensFilename, name, index),
+                    batch_filename(template, meshFilename, name, index))
+            if archive is None:
+                fn, kwargs = save_model, dict(options, path=path)
+            else:
+                fn, kwargs = stage_model, options
+            if pool == 'process':
+                future = executor.submit(_save_and_commit, fn, *args, **kwargs)
+            else:
+                future = executor.submit(fn, *args, **kwargs)
+            futures[name] = (gf, modelFilename, future)
+
+        for name, (gf, modelFilename, future) in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = {'error': '{}: {}'.format(type(e).__name__, e)}
+                continue
+
+            if archive is not None:
+                results[name]['record'] = archive.append_staged(os.path.basename(modelFilename), results[name])
+            elif fingerprints is not None:
+                fingerprints.record(results[name]['files'][0], gf.field_parameters, results[name]['files'])
+
+    seconds = time.perf_counter() - start
+    written = sum(r.get('bytes', 0) for r in results.values())
+    failed = [name for name, r in results.items() if 'error' in r]
+    summary = {
+        'models': len(results),
+        'failed': len(failed),
+        'skipped': sum(1 for r in results.values() if r.get('skipped')),
+        'bytes': written,
+        'seconds': seconds,
+        'models_per_second': len(results) / seconds if seconds > 0 else 0.0,
+        'megabytes_per_second': written / seconds / 1e6 if seconds > 0 else 0.0,
+    }
+    return results, summary
@@ -0,0 +1,139 @@
+"""
+Checksums of the files written by the Fieldwork Model Serialiser Step.
+
+Each output file gets a sidecar named after the file and the algorithm,
+e.g. model.geof.sha256, holding one line in the format of sha256sum
+(b2sum for blake2b, xxhsum for xxh64), so the files can be checked with
+those tools. A leading comment line records the size and modification
+time of the file when it was written, which the checksum tools ignore
+and verify uses to skip files that have not changed since.
+
+Parameter files written by this package and compressed files are hashed
+while their bytes are written. Files written by gias3 are hashed just
+after, while still in the page cache.
+"""
+
+import hashlib
+import os
+
+ALGORITHMS = ('sha256', 'blake2b', 'xxh64')
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def new_hash(algorithm):
+    if algorithm == 'sha256':
+        return hashlib.sha256()
+    elif algorithm == 'blake2b':
+        return hashlib.blake2b()
+    elif algorithm == 'xxh64':
+        try:
+            import xxhash
+        except ImportError:
+            raise ValueError('The xxh64 checksum needs the xxhash package')
+        return xxhash.xxh64()
+    raise ValueError('Unknown checksum algorithm: ' + str(algorithm))
+
+
+def sidecar_name(filename, algorithm):
+    return filename + '.' + algorithm
+
+
+def file_checksum(filename, algorithm):
+    h = new_hash(algorithm)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class HashingWriter(object):
+    """
+    Write-only file object that hashes the bytes written to f. It is not
+    seekable, so writers such as zipfile that would otherwise seek back
+    to patch earlier bytes write strictly sequentially instead.
+    """
+
+    def __init__(self, f, algorithm):
+        self._f = f
+        self.name = getattr(f, 'name', '')
+        self._hash = new_hash(algorithm)
+        self._position = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self._position += len(data)
+        return self._f.write(data)
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self._f.flush()
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def write_sidecar(filename, digest, algorithm):
+    """
+    Write the sidecar of filename and return its path.
+    """
+    stat = os.stat(filename)
+    sidecar = sidecar_name(filename, algorithm)
+    with open(sidecar, 'w', newline='\n') as f:
+        f.write('# fieldwork size={} mtime_ns={}\n'.format(stat.st_size, stat.st_mtime_ns))
+        f.write('{}  {}\n'.format(digest, os.path.basename(filename)))
+    return sidecar
+
+
+def read_sidecar(sidecar):
+    """
+    Return (digest, size, mtime_ns) recorded in sidecar. size and
+    mtime_ns are None if the sidecar was not written by this package.
+    """
+    digest = size = mtime = None
+    with open(sidecar) as f:
+        for line in f:
+            if line.startswith('# fieldwork '):
+                fields = dict(field.split('=', 1) for field in line.split()[2:])
+                size, mtime = int(fields['size']), int(fields['mtime_ns'])
+            elif line.strip() and not line.startswith('#'):
+                digest = line.split()[0]
+    return digest, size, mtime
+
+
+def verify(filename, algorithm='sha256', full=False):
+    """
+    Check filename against its sidecar. Returns 'ok' if the contents
+    hash to the recorded digest, 'unchanged' if the size and
+    modification time still match those recorded, so the file was not
+    read (unless full is True), 'mismatch', or 'missing' if the file or
+    its sidecar does not exist.
+    """
+    sidecar = sidecar_name(filename, algorithm)
+    if not (os.path.exists(filename) and os.path.exists(sidecar)):
+        return 'missing'
+    digest, size, mtime = read_sidecar(sidecar)
+    if not full and size is not None:
+        stat = os.stat(filename)
+        if stat.st_size == size and stat.st_mtime_ns == mtime:
+            return 'unchanged'
+    return 'ok' if file_checksum(filename, algorithm) == digest else 'mismatch'
+
+
+def verify_tree(root, algorithm='sha256', full=False):
+    """
+    verify every file under root that has a sidecar of algorithm, and
+    return a dict of file to result.
+    """
+    extension = '.' + algorithm
+    results = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(extension):
+                filename = os.path.join(directory, name[:-len(extension)])
+                results[filename] = verify(filename, algorithm, full)
+    return results
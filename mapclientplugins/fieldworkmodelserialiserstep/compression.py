@@ -0,0 +1,119 @@
+"""
+Compression of the text outputs (.geof, .ens and .mesh) of the Fieldwork
+Model Serialiser Step. A compressed file keeps its own extension followed
+by that of the codec, e.g. model.geof.gz, and starts with the standard
+magic bytes of the codec, so readers can detect it either way.
+"""
+
+import bz2
+import contextlib
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+
+from mapclientplugins.fieldworkmodelserialiserstep.checksum import HashingWriter
+
+COMPRESSIONS = ('none', 'gzip', 'bz2', 'lzma')
+EXTENSIONS = {'none': '', 'gzip': '.gz', 'bz2': '.bz2', 'lzma': '.xz'}
+# The cheapest level of each codec. Output over a slow network
+# filesystem is usually bound by bytes written, not CPU, and the cheap
+# levels already remove most of the redundancy of printed numbers.
+DEFAULT_LEVELS = {'gzip': 1, 'bz2': 1, 'lzma': 0}
+MAGIC = {'gzip': b'\x1f\x8b', 'bz2': b'BZh', 'lzma': b'\xfd7zXZ\x00'}
+COPY_BYTES = 1 << 20
+
+
+def compressed_name(filename, compression):
+    return filename + EXTENSIONS[compression]
+
+
+def open_compressed(filename, mode, compression, level=None):
+    """
+    Open filename, a path or file object, with the codec of compression.
+    level defaults to the cheap level of DEFAULT_LEVELS when writing.
+    """
+    if compression == 'none':
+        return open(filename, mode)
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    writing = 'r' not in mode
+    if compression == 'gzip':
+        return gzip.open(filename, mode, compresslevel=level) if writing else gzip.open(filename, mode)
+    elif compression == 'bz2':
+        return bz2.open(filename, mode, compresslevel=max(1, level)) if writing else bz2.open(filename, mode)
+    elif compression == 'lzma':
+        return lzma.open(filename, mode, preset=level) if writing else lzma.open(filename, mode)
+    raise ValueError('Unknown compression: ' + str(compression))
+
+
+def detect_compression(filename):
+    """
+    Return the compression of filename from its first bytes, or 'none'.
+    """
+    with open(filename, 'rb') as f:
+        start = f.read(max(len(magic) for magic in MAGIC.values()))
+    for compression, magic in MAGIC.items():
+        if start.startswith(magic):
+            return compression
+    return 'none'
+
+
+def open_file(filename, mode='rb'):
+    """
+    Open a file written by the step for reading, decompressing it if
+    needed. mode is 'rb' or 'rt'.
+    """
+    return open_compressed(filename, mode, detect_compression(filename))
+
+
+def compress_file(source, target, compression, level=None, checksum=None):
+    """
+    Stream source into target with the given codec. If checksum names
+    an algorithm of checksum.py, the compressed bytes are hashed as
+    they are written and the hex digest is returned.
+    """
+    with open(source, 'rb') as fin, open(target, 'wb') as raw:
+        hashed = HashingWriter(raw, checksum) if checksum else raw
+        with open_compressed(hashed, 'wb', compression, level) as fout:
+            shutil.copyfileobj(fin, fout, COPY_BYTES)
+    return hashed.hexdigest() if checksum else None
+
+
+def strip_extension(filename):
+    """
+    Return filename without a compression extension.
+    """
+    for compression in COMPRESSIONS[1:]:
+        if filename.endswith(EXTENSIONS[compression]):
+            return filename[:-len(EXTENSIONS[compression])]
+    return filename
+
+
+@contextlib.contextmanager
+def uncompressed(*filenames):
+    """
+    Yield the filenames with any compressed files replaced by
+    decompressed copies in a temporary directory, for readers such as
+    gias3 that only take paths. The copies keep their names without the
+    compression extension, so references between the .geof, .ens and
+    .mesh files still resolve. None entries are passed through.
+    """
+    staging = None
+    paths = []
+    try:
+        for filename in filenames:
+            if filename is None or detect_compression(filename) == 'none':
+                paths.append(filename)
+                continue
+            if staging is None:
+                staging = tempfile.mkdtemp(prefix='fieldwork-uncompressed-')
+            target = os.path.join(staging, os.path.basename(strip_extension(filename)))
+            with open_file(filename) as fin, open(target, 'wb') as fout:
+                shutil.copyfileobj(fin, fout, COPY_BYTES)
+            paths.append(target)
+        yield paths
+    finally:
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
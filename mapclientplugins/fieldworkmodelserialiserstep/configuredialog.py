@@ -1,6 +1,6 @@
-import os
 from PySide6 import QtWidgets
 from mapclientplugins.fieldworkmodelserialiserstep.ui_configuredialog import Ui_Dialog
+from mapclientplugins.fieldworkmodelserialiserstep.validation import output_location, validate_config
 
 INVALID_STYLE_SHEET = 'background-color: rgba(239, 0, 0, 50)'
 DEFAULT_STYLE_SHEET = 'background-color: rgba(255, 255, 255, 50)'
@@ -21,6 +21,9 @@ class ConfigureDialog(QtWidgets.QDialog):
         self._ui.setupUi(self)
 
         self._workflow_location = None
+        # Configuration values that are not edited by this dialog are
+        # passed through unchanged.
+        self._config = {}
 
         # Keep track of the previous identifier so that we can track changes
         # and know how many occurrences of the current identifier there should
@@ -73,29 +76,20 @@ class ConfigureDialog(QtWidgets.QDialog):
         """
         # Determine if the current identifier is unique throughout the workflow
         # The identifierOccursCount method is part of the interface to the workflow framework.
-        id_value = self.identifierOccursCount(self._ui.idLineEdit.text())
-        id_valid = (id_value == 0) or (id_value == 1 and self._previousIdentifier == self._ui.idLineEdit.text())
-        self._ui.idLineEdit.setStyleSheet(DEFAULT_STYLE_SHEET if id_valid else INVALID_STYLE_SHEET)
-        gf_loc_valid = False
-
-        for field in [self._ui.gfLocLineEdit, self._ui.ensLocLineEdit, self._ui.meshLocLineEdit, self._ui.pathLocLineEdit]:
-
-            text = field.text()
-            if field is not self._ui.pathLocLineEdit:
-                text = os.path.dirname(text)
-
-            output_location = self._output_location(text)
-            if self._workflow_location:
-                output_location = os.path.join(self._workflow_location, output_location)
-            field_valid = os.path.exists(output_location) and len(field.text())
-            field.setStyleSheet(DEFAULT_STYLE_SHEET if field_valid else INVALID_STYLE_SHEET)
-
-            if field is self._ui.gfLocLineEdit:
-                gf_loc_valid = field_valid
-
-        valid = id_valid and gf_loc_valid
-
-        self._ui.buttonBox.button(QtWidgets.QDialogButtonBox.Ok).setEnabled(id_valid)
+        fieldEdits = {
+            'identifier': self._ui.idLineEdit,
+            'GF Filename': self._ui.gfLocLineEdit,
+            'Ensemble Filename': self._ui.ensLocLineEdit,
+            'Mesh Filename': self._ui.meshLocLineEdit,
+            'Path': self._ui.pathLocLineEdit,
+        }
+        config = dict((key, edit.text()) for key, edit in fieldEdits.items())
+        valid, fields = validate_config(config, self._workflow_location, self.identifierOccursCount,
+                                        self._previousIdentifier)
+        for key, edit in fieldEdits.items():
+            edit.setStyleSheet(DEFAULT_STYLE_SHEET if fields[key] else INVALID_STYLE_SHEET)
+
+        self._ui.buttonBox.button(QtWidgets.QDialogButtonBox.Ok).setEnabled(fields['identifier'])
 
         return valid
 
@@ -110,12 +104,17 @@ class ConfigureDialog(QtWidgets.QDialog):
         self._previousEnsLoc = self._ui.ensLocLineEdit.text()
         self._previousMeshLoc = self._ui.meshLocLineEdit.text()
         self._previousPathLoc = self._ui.pathLocLineEdit.text()
-        config = {}
+        config = dict(self._config)
         config['identifier'] = self._ui.idLineEdit.text()
         config['GF Filename'] = self._ui.gfLocLineEdit.text()
         config['Ensemble Filename'] = self._ui.ensLocLineEdit.text()
         config['Mesh Filename'] = self._ui.meshLocLineEdit.text()
         config['Path'] = self._ui.pathLocLineEdit.text()
+        config['Asynchronous Write'] = self._ui.asyncCheckBox.isChecked()
+        config['Output Format'] = self._ui.formatComboBox.currentText()
+        config['Precision'] = self._ui.precisionComboBox.currentText()
+        config['Significant Digits'] = self._ui.digitsSpinBox.value()
+        config['Compression'] = self._ui.compressionComboBox.currentText()
         return config
 
     def setConfig(self, config):
@@ -124,6 +123,7 @@ class ConfigureDialog(QtWidgets.QDialog):
         set the _previousIdentifier value so that we can check uniqueness of the
         identifier over the whole of the workflow.
         '''
+        self._config = dict(config)
         self._previousIdentifier = config['identifier']
         self._previousGFLoc = config['GF Filename']
         self._previousEnsLoc = config['Ensemble Filename']
@@ -134,13 +134,14 @@ class ConfigureDialog(QtWidgets.QDialog):
         self._ui.ensLocLineEdit.setText(config['Ensemble Filename'])
         self._ui.meshLocLineEdit.setText(config['Mesh Filename'])
         self._ui.pathLocLineEdit.setText(config['Path'])
+        self._ui.asyncCheckBox.setChecked(config['Asynchronous Write'])
+        self._ui.formatComboBox.setCurrentText(config['Output Format'])
+        self._ui.precisionComboBox.setCurrentText(config['Precision'])
+        self._ui.digitsSpinBox.setValue(int(config['Significant Digits']))
+        self._ui.compressionComboBox.setCurrentText(config['Compression'])
 
     def _output_location(self, location):
-        display_path = location
-        if self._workflow_location and os.path.isabs(display_path):
-            display_path = os.path.relpath(display_path, self._workflow_location)
-
-        return display_path
+        return output_location(location, self._workflow_location)
 
     def _gfLocClicked(self):
         location = QtWidgets.QFileDialog.getSaveFileName(self, 'Select File Location', self._previousGFLoc)
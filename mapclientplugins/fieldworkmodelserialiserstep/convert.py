@@ -0,0 +1,181 @@
+"""
+Command line bulk converter for trees of models written by the Fieldwork
+Model Serialiser Step, without a MAP Client workflow.
+
+Every .geof file under the input directory is paired with the .ens and
+.mesh files of the same name, or with the only .ens and .mesh files of
+its directory, loaded through gias3 and written again through
+serialiser.save_model, the code path of the step's execute, by a pool
+of processes. The output tree mirrors the input tree. A model is
+skipped when all its outputs exist and are newer than its inputs.
+Outputs are always written atomically.
+
+    fieldwork-serialise models/ converted/ --format npy --workers 8
+    fieldwork-serialise models/ converted/ --config workflow/serialiser.conf
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from mapclientplugins.fieldworkmodelserialiserstep.checksum import ALGORITHMS
+from mapclientplugins.fieldworkmodelserialiserstep.compression import COMPRESSIONS, strip_extension, uncompressed
+from mapclientplugins.fieldworkmodelserialiserstep.durability import commit_all
+from mapclientplugins.fieldworkmodelserialiserstep.formats import FORMATS
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import is_object_url
+from mapclientplugins.fieldworkmodelserialiserstep.precision import PRECISIONS
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import ENSEMBLE_EXTENSION, GF_EXTENSION, \
+    MESH_EXTENSION, output_paths, save_model, save_options
+from mapclientplugins.fieldworkmodelserialiserstep.surface import SURFACE_FORMATS
+
+
+def find_models(root):
+    """
+    Yield (geof, ens, mesh) for every .geof file under root, compressed
+    or not. ens and mesh are None if no pairing file is found.
+    """
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        stems = {}
+        for name in sorted(names):
+            plain = strip_extension(name)
+            for extension in (GF_EXTENSION, ENSEMBLE_EXTENSION, MESH_EXTENSION):
+                if plain.endswith(extension):
+                    stems.setdefault(extension, {})[plain[:-len(extension)]] = os.path.join(directory, name)
+
+        ensembles = stems.get(ENSEMBLE_EXTENSION, {})
+        meshes = stems.get(MESH_EXTENSION, {})
+        onlyEnsemble = list(ensembles.values())[0] if len(ensembles) == 1 else None
+        onlyMesh = list(meshes.values())[0] if len(meshes) == 1 else None
+        for stem, geof in stems.get(GF_EXTENSION, {}).items():
+            yield geof, ensembles.get(stem, onlyEnsemble), meshes.get(stem, onlyMesh)
+
+
+def _stem(filename, extension):
+    return None if filename is None else os.path.basename(strip_extension(filename))[:-len(extension)]
+
+
+def plan(geof, ens, mesh, inputRoot, outputRoot, options):
+    """
+    Return the save_model arguments converting one model, and the
+    files it will write.
+    """
+    relative = os.path.relpath(os.path.dirname(geof), inputRoot)
+    if is_object_url(outputRoot):
+        path = outputRoot.rstrip('/') + ('' if relative == '.' else '/' + relative.replace(os.sep, '/'))
+    else:
+        path = os.path.normpath(os.path.join(outputRoot, relative))
+    names = (_stem(geof, GF_EXTENSION), _stem(ens, ENSEMBLE_EXTENSION), _stem(mesh, MESH_EXTENSION))
+    targets = output_paths(names[0], names[1], names[2], path, options['fmt'], options['compression'],
+                           options['surfaces'])
+    return names, path, targets
+
+
+def up_to_date(sources, targets):
+    """
+    True if every target exists and is no older than every source.
+    Object store targets are never up to date.
+    """
+    if any(is_object_url(t) or not os.path.exists(t) for t in targets):
+        return False
+    newest = max(os.path.getmtime(s) for s in sources if s is not None)
+    return min(os.path.getmtime(t) for t in targets) >= newest
+
+
+def convert_model(geof, ens, mesh, names, path, options):
+    """
+    Load one model through gias3 and write it with save_model. Runs in
+    a worker process, so any group commit is made before returning.
+    """
+    from gias3.fieldwork.field import geometric_field
+
+    with uncompressed(geof, ens, mesh) as files:
+        gf = geometric_field.load_geometric_field(*files)
+    if not is_object_url(path):
+        os.makedirs(path, exist_ok=True)
+    try:
+        return save_model(gf, names[0], names[1], names[2], path, **options)
+    finally:
+        commit_all()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='fieldwork-serialise', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help='directory searched for .geof files')
+    parser.add_argument('output', help='directory, or s3:// URL, the converted tree is written to')
+    parser.add_argument('--config', default=None,
+                        help='serialiser step config file to take the output settings from; '
+                             'the options below override it')
+    parser.add_argument('--format', dest='fmt', choices=FORMATS, default=None)
+    parser.add_argument('--precision', choices=PRECISIONS, default=None)
+    parser.add_argument('--digits', type=int, default=None, help='significant digits of .geof output')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default=None)
+    parser.add_argument('--compression-level', dest='compressionLevel', type=int, default=None)
+    parser.add_argument('--surfaces', nargs='*', choices=SURFACE_FORMATS, default=None)
+    parser.add_argument('--checksum', choices=ALGORITHMS, default=None, help='write checksum sidecars')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='convert models that are up to date')
+    parser.add_argument('--dry-run', dest='dryRun', action='store_true', help='list the models to convert')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {}
+    location = ''
+    if args.config is not None:
+        with open(args.config) as f:
+            config = json.load(f)
+        location = os.path.dirname(os.path.abspath(args.config))
+    options = save_options(config, location)
+    for key in ('fmt', 'precision', 'digits', 'compression', 'compressionLevel', 'checksum'):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    if args.surfaces is not None:
+        options['surfaces'] = tuple(args.surfaces)
+    # Models sharing an ensemble write the same .ens and .mesh files
+    # concurrently, which is only safe with write-and-rename.
+    options['atomic'] = True
+
+    jobs = []
+    skipped = 0
+    for geof, ens, mesh in find_models(args.input):
+        names, path, targets = plan(geof, ens, mesh, args.input, args.output, options)
+        if not args.force and up_to_date((geof, ens, mesh), targets):
+            skipped += 1
+            continue
+        jobs.append((geof, ens, mesh, names, path))
+    print('{} models to convert, {} up to date'.format(len(jobs), skipped), file=sys.stderr)
+    if args.dryRun:
+        for job in jobs:
+            print(job[0])
+        return 0
+
+    failed = 0
+    written = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = dict((executor.submit(convert_model, *job, options=options), job[0]) for job in jobs)
+        for done, future in enumerate(as_completed(futures), 1):
+            seconds = time.perf_counter() - start
+            try:
+                written += future.result()['bytes']
+                status = 'ok'
+            except Exception as e:
+                failed += 1
+                status = 'FAILED {}: {}'.format(type(e).__name__, e)
+            print('[{}/{}] {} {} ({:.1f} models/s, {:.1f} MB/s)'.format(
+                done, len(jobs), futures[future], status, done / seconds, written / seconds / 1e6),
+                file=sys.stderr)
+
+    seconds = time.perf_counter() - start
+    print('converted {} models ({} bytes) in {:.1f} s, {} failed, {} up to date'.format(
+        len(jobs) - failed, written, seconds, failed, skipped), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
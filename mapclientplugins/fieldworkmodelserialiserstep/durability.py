@@ -0,0 +1,141 @@
+"""
+Crash-safe output for the Fieldwork Model Serialiser Step.
+
+Files are written into a staging directory beside their destination and
+renamed into place, so a crash never leaves a truncated output under the
+final name. Whether the renamed files are also forced to disk is set by
+a policy:
+
+none  : leave it to the operating system.
+file  : fsync every file before it is renamed, and its directory after.
+group : fsync the files renamed since the last commit together, once
+        group_files have been renamed or group_millis have passed since
+        the first of them, trading a short window of possible loss for
+        far fewer fsync calls than 'file'.
+"""
+
+import atexit
+import errno
+import os
+import shutil
+import threading
+
+POLICIES = ('none', 'group', 'file')
+DEFAULT_GROUP_FILES = 64
+DEFAULT_GROUP_MILLIS = 1000
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def fsync_file(filename):
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_directory(directory):
+    # Directories cannot be opened for fsync on Windows.
+    if os.name == 'nt':
+        return
+    fsync_file(directory)
+
+
+def replace(staged, target):
+    """
+    Rename staged onto target. If they are on different filesystems,
+    staged is copied next to target first so the final step is still a
+    rename.
+    """
+    try:
+        os.replace(staged, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        partial = '{}.{}.partial'.format(target, os.getpid())
+        shutil.copy2(staged, partial)
+        os.replace(partial, target)
+        os.remove(staged)
+
+
+def get_group_commit(groupFiles=DEFAULT_GROUP_FILES, groupMillis=DEFAULT_GROUP_MILLIS):
+    """
+    Return the GroupCommit for the given limits, shared by every writer
+    in this process.
+    """
+    key = (groupFiles, groupMillis)
+    with _groups_lock:
+        if key not in _groups:
+            _groups[key] = GroupCommit(groupFiles, groupMillis)
+        return _groups[key]
+
+
+def commit_all():
+    """
+    fsync everything pending in every GroupCommit of this process.
+    """
+    with _groups_lock:
+        groups = list(_groups.values())
+    for group in groups:
+        group.commit()
+
+
+atexit.register(commit_all)
+
+
+class GroupCommit(object):
+    """
+    Collects renamed files and fsyncs them, and then their directories,
+    in one batch. A batch is committed by the add() that fills it, or by
+    a timer groupMillis after its first file was added.
+    """
+
+    def __init__(self, groupFiles=DEFAULT_GROUP_FILES, groupMillis=DEFAULT_GROUP_MILLIS):
+        self.groupFiles = groupFiles
+        self.groupMillis = groupMillis
+        self.commits = 0
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._commitLock = threading.Lock()
+
+    def add(self, files):
+        with self._lock:
+            self._pending.extend(files)
+            full = len(self._pending) >= self.groupFiles
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.groupMillis / 1000.0, self.commit)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.commit()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def commit(self):
+        with self._commitLock:
+            with self._lock:
+                files = self._pending
+                self._pending = []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not files:
+                return
+            # Files, and their directories, removed since they were added
+            # have nothing left to make durable.
+            for f in files:
+                try:
+                    fsync_file(f)
+                except FileNotFoundError:
+                    pass
+            for directory in set(os.path.dirname(os.path.abspath(f)) for f in files):
+                try:
+                    fsync_directory(directory)
+                except FileNotFoundError:
+                    pass
+            self.commits += 1
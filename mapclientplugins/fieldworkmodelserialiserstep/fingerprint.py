@@ -0,0 +1,98 @@
+"""
+Parameter fingerprints for skipping writes of models that have not
+changed since they were last written. A fingerprint is kept in memory
+for each target .geof file, and in a small sidecar file next to it so
+that unchanged models are also skipped after a restart. Models sent
+to an object store are always written.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import is_object_url
+from mapclientplugins.fieldworkmodelserialiserstep.streaming import iter_chunks
+
+SIDECAR_EXTENSION = '.fingerprint'
+
+
+def parameter_fingerprint(params):
+    """
+    Return a hex digest of the shape, dtype and values of params. The
+    values are hashed chunk by chunk, so params is never copied whole.
+    """
+    h = hashlib.sha256()
+    h.update(str((params.shape, params.dtype.str)).encode('ascii'))
+    for chunk in iter_chunks(params):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _files_intact(files):
+    return all(os.path.exists(f) and os.path.getsize(f) == size for f, size in files.items())
+
+
+class FingerprintCache(object):
+    """
+    Remembers the parameters last written to each .geof file. A model
+    is unchanged if every file written last time is still on disk with
+    the same size, and its parameters either hash to the recorded
+    fingerprint or, with a non-zero tolerance, differ from the last
+    written parameters held in memory by no more than tolerance. A
+    copy of the parameters is only kept when tolerance is non-zero.
+    """
+
+    def __init__(self, tolerance=0.0):
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def unchanged(self, gfPath, params):
+        with self._lock:
+            entry = self._last.get(gfPath)
+        if entry is None:
+            entry = self._read_sidecar(gfPath)
+
+        unchanged = False
+        if entry is not None and _files_intact(entry['files']):
+            last = entry.get('params')
+            if self.tolerance > 0 and last is not None and last.shape == params.shape:
+                unchanged = bool(np.abs(params - last).max(initial=0.0) <= self.tolerance)
+            else:
+                unchanged = entry['fingerprint'] == parameter_fingerprint(params)
+
+        with self._lock:
+            if unchanged:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return unchanged
+
+    def record(self, gfPath, params, files):
+        """
+        Record that params were written to gfPath, producing files.
+        """
+        if is_object_url(gfPath):
+            return
+        entry = {
+            'fingerprint': parameter_fingerprint(params),
+            'files': dict((f, os.path.getsize(f)) for f in files if os.path.exists(f)),
+        }
+        with open(gfPath + SIDECAR_EXTENSION, 'w') as f:
+            json.dump(entry, f)
+        if self.tolerance > 0:
+            entry['params'] = np.array(params, copy=True)
+        with self._lock:
+            self._last[gfPath] = entry
+
+    def _read_sidecar(self, gfPath):
+        try:
+            with open(gfPath + SIDECAR_EXTENSION) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
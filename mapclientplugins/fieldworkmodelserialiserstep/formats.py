@@ -0,0 +1,117 @@
+"""
+Binary output formats for the nodal parameters of a GeometricField.
+
+npz : compressed numpy archive holding the parameters and a JSON header.
+npy : raw numpy array that can be memory-mapped, with the JSON header
+      in a .json file of the same name.
+
+The header records the array shape and dtype, the precision it was
+stored at (see precision.py) and the ensemble and mesh files of the
+model, so a loader can rebuild the GeometricField.
+
+save_geof streams the gias3 .geof text format in the same way.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from mapclientplugins.fieldworkmodelserialiserstep.checksum import HashingWriter
+from mapclientplugins.fieldworkmodelserialiserstep.precision import dequantise
+from mapclientplugins.fieldworkmodelserialiserstep.streaming import DEFAULT_CHUNK_BYTES, write_geof, write_npy, \
+    write_npz
+
+FORMATS = ('geof', 'npz', 'npy')
+EXTENSIONS = {'geof': '.geof', 'npz': '.npz', 'npy': '.npy'}
+HEADER_EXTENSION = '.json'
+FORMAT_VERSION = 1
+
+
+def make_header(gf, params, ensemble=None, mesh=None, precision=None):
+    """
+    params is the array as stored, and precision the info returned by
+    precision.quantise when it was reduced.
+    """
+    return {
+        'format_version': FORMAT_VERSION,
+        'name': getattr(gf, 'name', None),
+        'shape': list(params.shape),
+        'dtype': params.dtype.str,
+        'precision': precision or {'precision': params.dtype.name},
+        'ensemble': ensemble,
+        'mesh': mesh,
+    }
+
+
+def save_parameters(filename, params, header, fmt, chunkBytes=DEFAULT_CHUNK_BYTES, checksum=None, digests=None):
+    """
+    Write params and header to filename plus the extension of fmt,
+    streaming the parameters in chunks of chunkBytes. Returns the list
+    of files written. If checksum names an algorithm of checksum.py,
+    each file is hashed as it is written and its hex digest is stored
+    in the dict digests.
+    """
+    def write(target, fn, *args):
+        _write(target, checksum, digests, fn, *args)
+
+    if fmt == 'npz':
+        target = filename + EXTENSIONS['npz']
+        write(target, write_npz, {'field_parameters': params, 'header': np.array(json.dumps(header))},
+              True, chunkBytes)
+        return [target]
+    elif fmt == 'npy':
+        target = filename + EXTENSIONS['npy']
+        write(target, write_npy, params, chunkBytes)
+        write(filename + HEADER_EXTENSION, _write_json, header)
+        return [target, filename + HEADER_EXTENSION]
+    raise ValueError('Unknown binary format: ' + str(fmt))
+
+
+def save_geof(filename, gf, ensembleField=None, chunkBytes=DEFAULT_CHUNK_BYTES, digits=0, checksum=None,
+              digests=None):
+    """
+    Write the .geof file of gf to filename plus .geof as gias3 would,
+    streaming the nodal parameters at digits significant figures (see
+    streaming.write_geof). The ensemble and mesh are not written. Returns the list of files
+    written, hashed into digests as for save_parameters.
+    """
+    target = filename + EXTENSIONS['geof']
+    _write(target, checksum, digests, write_geof, gf, ensembleField, chunkBytes, digits)
+    return [target]
+
+
+def _write(target, checksum, digests, fn, *args):
+    with open(target, 'wb') as raw:
+        f = HashingWriter(raw, checksum) if checksum else raw
+        fn(f, *args)
+    if checksum:
+        digests[target] = f.hexdigest()
+
+
+def _write_json(f, header):
+    f.write(json.dumps(header, indent=4).encode('utf-8'))
+
+
+def load_parameters(filename, mmap=True, restore=True):
+    """
+    Load the nodal parameters and header written by save_parameters.
+    filename must include the .npz or .npy extension. The parameters of
+    a .npy file are memory-mapped read-only unless mmap is False.
+    Fixed-point parameters are converted back to floats unless restore
+    is False.
+    """
+    root, extension = os.path.splitext(filename)
+    if extension == EXTENSIONS['npz']:
+        with np.load(filename) as data:
+            params, header = data['field_parameters'], json.loads(str(data['header']))
+    elif extension == EXTENSIONS['npy']:
+        params = np.load(filename, mmap_mode='r' if mmap else None)
+        with open(root + HEADER_EXTENSION) as f:
+            header = json.load(f)
+    else:
+        raise ValueError('Not a binary fieldwork parameter file: ' + filename)
+
+    if restore:
+        params = dequantise(params, header.get('precision'))
+    return params, header
@@ -0,0 +1,110 @@
+"""
+Write journal for resuming an interrupted population export.
+
+The journal is a JSON-lines file in each output directory. Every model
+written appends one line recording its .geof filename, the fingerprint
+of its parameters and the size of each file it produced, once all of
+them are in place. The journal of a directory is read once, into a dict
+keyed by filename, so a restarted export checks each model with one
+lookup and a stat of its files, and skips those that were completed
+with the same parameters. A line cut short by a crash is ignored, so
+the model it belongs to is written again.
+"""
+
+import json
+import os
+import threading
+import time
+
+from mapclientplugins.fieldworkmodelserialiserstep.fingerprint import parameter_fingerprint
+from mapclientplugins.fieldworkmodelserialiserstep.manifest import append_json_lines
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import is_object_url
+
+JOURNAL_FILENAME = 'fieldwork_journal.jsonl'
+
+
+def load_journal(directory):
+    """
+    Return a dict of the latest journal entry of each filename in the
+    journal of directory.
+    """
+    entries = {}
+    try:
+        with open(os.path.join(directory, JOURNAL_FILENAME), 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                entries[entry['filename']] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+class WriteJournal(object):
+    """
+    Skips models already written with the same parameters, as recorded
+    in the journals of their output directories. Used in place of a
+    FingerprintCache by save_batch and the step.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._journals = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, directory):
+        with self._lock:
+            entries = self._journals.get(directory)
+        if entries is None:
+            entries = load_journal(directory)
+            with self._lock:
+                entries = self._journals.setdefault(directory, entries)
+        return entries
+
+    def unchanged(self, gfPath, params):
+        complete = False
+        if not is_object_url(gfPath):
+            directory, filename = os.path.split(os.path.abspath(gfPath))
+            entry = self._entries(directory).get(filename)
+            if entry is not None and self._intact(directory, entry['files']):
+                complete = entry['fingerprint'] == parameter_fingerprint(params)
+
+        with self._lock:
+            if complete:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return complete
+
+    def record(self, gfPath, params, files):
+        """
+        Append to the journal that params were written to gfPath,
+        producing files.
+        """
+        if is_object_url(gfPath):
+            return
+        directory, filename = os.path.split(os.path.abspath(gfPath))
+        entry = {
+            'filename': filename,
+            'fingerprint': parameter_fingerprint(params),
+            'files': dict((os.path.relpath(os.path.abspath(f), directory), os.path.getsize(f))
+                          for f in files if os.path.exists(f)),
+            'time': time.time(),
+        }
+        append_json_lines(os.path.join(directory, JOURNAL_FILENAME), [entry])
+        entries = self._entries(directory)
+        with self._lock:
+            entries[filename] = entry
+
+    @staticmethod
+    def _intact(directory, files):
+        for f, size in files.items():
+            try:
+                if os.path.getsize(os.path.join(directory, f)) != size:
+                    return False
+            except OSError:
+                return False
+        return True
@@ -0,0 +1,137 @@
+"""
+Manifest of the models serialised into an output directory, so that
+downstream tools can find and filter models without opening them.
+
+The manifest is a JSON-lines file in the directory holding the model
+files. Each written model appends one line, and a later line for the
+same filename replaces an earlier one. Lines are appended with a single
+write to a file opened for appending, under an exclusive lock where the
+platform supports one, so several steps or processes can write models
+into the same directory.
+"""
+
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, where appends of one write are not interleaved either.
+    fcntl = None
+
+from mapclientplugins.fieldworkmodelserialiserstep.compression import strip_extension
+from mapclientplugins.fieldworkmodelserialiserstep.fingerprint import parameter_fingerprint
+from mapclientplugins.fieldworkmodelserialiserstep.metrics import model_counts
+
+MANIFEST_FILENAME = 'fieldwork_manifest.jsonl'
+MANIFEST_VERSION = 1
+
+
+def manifest_entry(gf, result, directory):
+    """
+    Return the manifest entry of a model written by save_model, with
+    file paths relative to directory. The file checksums are included
+    when save_model computed them.
+    """
+    def relative(f):
+        return None if f is None else os.path.relpath(f, directory)
+
+    files = result['files']
+    ensemble = [f for f in files if strip_extension(f).endswith('.ens')] or [result.get('ensemble')]
+    mesh = [f for f in files if strip_extension(f).endswith('.mesh')] or [result.get('mesh')]
+    nodes, elements = model_counts(gf)
+    return {
+        'version': MANIFEST_VERSION,
+        'filename': relative(files[0]),
+        'files': [relative(f) for f in files],
+        'ensemble': relative(ensemble[0]),
+        'mesh': relative(mesh[0]),
+        'name': getattr(gf, 'name', None),
+        'nodes': nodes,
+        'elements': elements,
+        'parameter_sha256': parameter_fingerprint(gf.field_parameters),
+        'bytes': sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+        'checksums': dict((relative(f), digest) for f, digest in result.get('checksums', {}).items()) or None,
+        'time': time.time(),
+    }
+
+
+def append_entries(directory, entries):
+    """
+    Append entries to the manifest in directory in one locked write.
+    """
+    append_json_lines(os.path.join(directory, MANIFEST_FILENAME), entries)
+
+
+def append_json_lines(filename, entries):
+    """
+    Append entries to the JSON-lines file filename in one locked write.
+    A last line cut short by a crash is ended first, so that readers
+    skip it rather than the first entry appended.
+    """
+    if not entries:
+        return
+    data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+    fd = os.open(filename, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        size = os.fstat(fd).st_size
+        if size:
+            os.lseek(fd, size - 1, os.SEEK_SET)
+            if os.read(fd, 1) != b'\n':
+                data = b'\n' + data
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def record_models(models):
+    """
+    Add each (gf, result) pair of models to the manifest of the
+    directory of its parameter file, one write per directory.
+    """
+    entries = {}
+    for gf, result in models:
+        directory = os.path.dirname(os.path.abspath(result['files'][0]))
+        entries.setdefault(directory, []).append(manifest_entry(gf, result, directory))
+    for directory, directoryEntries in entries.items():
+        append_entries(directory, directoryEntries)
+
+
+def load_manifest(directory):
+    """
+    Return a dict of the latest entry of each model filename in the
+    manifest of directory. A line cut short by a crashed writer is
+    skipped.
+    """
+    entries = {}
+    try:
+        with open(os.path.join(directory, MANIFEST_FILENAME), 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                entries[entry['filename']] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def find_models(directory, **criteria):
+    """
+    Return the manifest entries of directory whose values equal every
+    keyword in criteria, e.g. find_models(path, mesh='femur.mesh').
+    Callable values are used as predicates instead.
+    """
+    def matches(entry):
+        for key, value in criteria.items():
+            if callable(value):
+                if not value(entry.get(key)):
+                    return False
+            elif entry.get(key) != value:
+                return False
+        return True
+
+    return [entry for entry in load_manifest(directory).values() if matches(entry)]
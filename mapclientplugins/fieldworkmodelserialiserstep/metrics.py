@@ -0,0 +1,89 @@
+"""
+Per-execution metrics of the Fieldwork Model Serialiser Step. A record
+is built from each save_model result, logged, and optionally appended
+as one JSON line to a metrics file so that runs can be aggregated.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def model_counts(gf):
+    """
+    Return the number of nodes and elements of gf. The element count
+    is None if the mesh does not expose its elements.
+    """
+    nodes = gf.field_parameters.shape[1]
+    try:
+        elements = len(gf.ensemble_field_function.mesh.elements)
+    except (AttributeError, TypeError):
+        elements = None
+    return nodes, elements
+
+
+def _file_records(writes):
+    """
+    One entry per file, with its own size and the time of the write
+    call that produced it. Files written by the same call, such as an
+    .ens with its .mesh, share a call number and time. Links
+    into the shared store count as zero bytes. Uploads record their
+    sizes, as the objects are not on the local filesystem.
+    """
+    files = []
+    for call, write in enumerate(writes):
+        for index, f in enumerate(write['files']):
+            if 'sizes' in write:
+                size = write['sizes'][index]
+            else:
+                linked = not os.path.isfile(f) or os.path.islink(f) or os.stat(f).st_nlink > 1
+                size = 0 if linked else os.path.getsize(f)
+            files.append({'path': f, 'bytes': size, 'seconds': write['seconds'], 'call': call})
+    return files
+
+
+def make_record(identifier, gf, result, **extra):
+    """
+    Return a JSON-serialisable metrics record for one written model.
+    extra is merged in, e.g. the queue wait of an asynchronous write.
+    """
+    nodes, elements = model_counts(gf)
+    record = {
+        'time': time.time(),
+        'step': identifier,
+        'nodes': nodes,
+        'elements': elements,
+        'seconds': result.get('seconds'),
+        'bytes': result.get('bytes'),
+        'files': _file_records(result.get('writes', [])),
+    }
+    record.update(extra)
+    return record
+
+
+def log_record(record):
+    logger.info('%s: wrote %s nodes, %s elements, %s bytes in %.3f s',
+                record['step'], record['nodes'], record['elements'], record['bytes'], record['seconds'] or 0.0)
+    for f in record['files']:
+        logger.debug('  %s: %s bytes in %.3f s', f['path'], f['bytes'], f['seconds'])
+
+
+class MetricsFile(object):
+    """
+    Appends records as JSON lines to filename. Safe to share between
+    writer threads.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            with open(self.filename, 'a') as f:
+                f.write(line)
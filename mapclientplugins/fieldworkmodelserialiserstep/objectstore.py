@@ -0,0 +1,94 @@
+"""
+S3-compatible object-store destination for the Fieldwork Model
+Serialiser Step. A Path or GF filename of the form s3://bucket/prefix
+sends the written files to the bucket instead of the local filesystem.
+
+Uploads go through one boto3 client and transfer manager per endpoint
+and process, so the connection pool is reused across executions and
+the files of a model are uploaded concurrently, each in concurrent
+multipart chunks once it is larger than the part size. The endpoint
+can point at any S3-compatible server, such as MinIO or a local moto
+server. boto3 is only imported when an object store is used.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+SCHEME = 's3://'
+DEFAULT_CONNECTIONS = 10
+DEFAULT_PART_BYTES = 8 << 20
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def is_object_url(location):
+    return isinstance(location, str) and location.startswith(SCHEME)
+
+
+def split_url(url):
+    """
+    Return the (bucket, key) of an s3:// URL.
+    """
+    bucket, _, key = url[len(SCHEME):].partition('/')
+    if not bucket:
+        raise ValueError('No bucket in object store URL: ' + url)
+    return bucket, key
+
+
+def join_url(url, name):
+    return url.rstrip('/') + '/' + name
+
+
+def get_sink(endpoint=None, connections=DEFAULT_CONNECTIONS, partBytes=DEFAULT_PART_BYTES):
+    """
+    Return the ObjectStoreSink for endpoint, shared by every writer in
+    this process. endpoint defaults to the AWS_ENDPOINT_URL environment
+    variable, then to AWS itself.
+    """
+    endpoint = endpoint or os.environ.get('AWS_ENDPOINT_URL') or None
+    key = (endpoint, connections, partBytes)
+    with _sinks_lock:
+        if key not in _sinks:
+            _sinks[key] = ObjectStoreSink(endpoint, connections, partBytes)
+        return _sinks[key]
+
+
+class ObjectStoreSink(object):
+    """
+    Uploads local files to s3:// URLs. Credentials and region come from
+    the usual boto3 configuration.
+    """
+
+    def __init__(self, endpoint=None, connections=DEFAULT_CONNECTIONS, partBytes=DEFAULT_PART_BYTES):
+        import boto3
+        from boto3.s3.transfer import TransferConfig, create_transfer_manager
+        from botocore.config import Config
+
+        self.endpoint = endpoint
+        self._client = boto3.session.Session().client(
+            's3', endpoint_url=endpoint, config=Config(max_pool_connections=connections))
+        self._transfer = create_transfer_manager(self._client, TransferConfig(
+            multipart_threshold=partBytes, multipart_chunksize=partBytes,
+            max_concurrency=connections, use_threads=True))
+        atexit.register(self.close)
+
+    def upload(self, sources, urls):
+        """
+        Upload each local file in sources to the URL at the same index of
+        urls, concurrently, and return a write entry as used by
+        serialiser.save_model, with the size of each file under 'sizes'.
+        """
+        start = time.perf_counter()
+        futures = [self._transfer.upload(source, *split_url(url)) for source, url in zip(sources, urls)]
+        for future in futures:
+            future.result()
+        sizes = [os.path.getsize(source) for source in sources]
+        return {'files': list(urls), 'bytes': sum(sizes), 'sizes': sizes,
+                'seconds': time.perf_counter() - start, 'upload': True}
+
+    def close(self):
+        self._transfer.shutdown()
+        atexit.unregister(self.close)
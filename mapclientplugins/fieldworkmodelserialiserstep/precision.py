@@ -0,0 +1,66 @@
+"""
+Reduced-precision storage of nodal parameters.
+
+Binary formats can store parameters as float64, float32, or as unsigned
+fixed-point integers with a per-component offset and scale. The .geof
+text is printed at a number of significant digits by
+streaming.write_geof, or rounded to them here when gias3 writes it. The
+precision used is recorded in the binary header so that loaders can
+restore the values.
+"""
+
+import numpy as np
+
+PRECISIONS = ('float64', 'float32', 'fixed32', 'fixed16')
+_FIXED_TYPES = {'fixed32': np.uint32, 'fixed16': np.uint16}
+
+
+def round_significant(params, digits):
+    """
+    Return params rounded to digits significant figures. digits of 0
+    returns params unchanged.
+    """
+    if not digits:
+        return params
+    params = np.asarray(params, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        magnitude = np.floor(np.log10(np.abs(params)))
+    magnitude[~np.isfinite(magnitude)] = 0
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(params * scale) / scale
+
+
+def quantise(params, precision):
+    """
+    Return (stored, info), where stored is params in the given precision
+    and info describes how to restore it. Fixed-point values map the
+    range of each component (axis 0) onto the full integer range.
+    """
+    if precision == 'float64':
+        return params, {'precision': precision}
+    elif precision == 'float32':
+        return params.astype(np.float32), {'precision': precision}
+    elif precision in _FIXED_TYPES:
+        dtype = _FIXED_TYPES[precision]
+        axes = tuple(range(1, params.ndim))
+        offset = params.min(axis=axes, keepdims=True)
+        span = params.max(axis=axes, keepdims=True) - offset
+        scale = np.where(span > 0, span / np.iinfo(dtype).max, 1.0)
+        stored = np.round((params - offset) / scale).astype(dtype)
+        return stored, {'precision': precision,
+                        'offset': offset.ravel().tolist(),
+                        'scale': scale.ravel().tolist()}
+    raise ValueError('Unknown precision: ' + str(precision))
+
+
+def dequantise(stored, info):
+    """
+    Restore parameters stored by quantise. Float precisions are returned
+    as they are, so memory-mapped arrays stay memory-mapped.
+    """
+    if info is None or info['precision'] not in _FIXED_TYPES:
+        return stored
+    shape = (-1,) + (1,) * (stored.ndim - 1)
+    offset = np.asarray(info['offset']).reshape(shape)
+    scale = np.asarray(info['scale']).reshape(shape)
+    return stored * scale + offset
@@ -0,0 +1,275 @@
+"""
+Out-of-process write-behind for the Fieldwork Model Serialiser Step.
+
+A persistent worker process formats and writes the queued models, so
+the time spent serialising, including text formatting that holds the
+GIL, is taken off the process running the workflow and its GUI. The
+nodal parameters of each model are copied once into a shared memory
+block that the worker maps, instead of being pickled through a pipe.
+The rest of the GeometricField, with its ensemble and mesh, is pickled
+once per ensemble, and the worker attaches each model's parameters to
+its copy of that template. Only the most recently used templates are
+kept, on both sides, and an ensemble evicted is sent again when next
+used. The worker reports each completed write
+back, and the shared memory block is then reused for a later model.
+"""
+
+import collections
+import copy
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+from concurrent.futures import Future, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+POLL_SECONDS = 0.5
+
+
+def _close_block(block):
+    try:
+        block.close()
+    except BufferError:
+        # Still viewed, e.g. from a traceback; unmapped when collected.
+        pass
+
+
+def _picklable(error):
+    error.__traceback__ = None
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError('{}: {}'.format(type(error).__name__, error))
+
+
+def _save(template, blockName, shape, dtype, name, args, options):
+    from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+    block = shared_memory.SharedMemory(name=blockName)
+    gf = None
+    try:
+        gf = copy.copy(template)
+        gf.field_parameters = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        if name is not None:
+            gf.name = name
+        return save_model(gf, *args, **options)
+    finally:
+        gf = None
+        _close_block(block)
+
+
+def _worker_main(requests, replies):
+    """
+    Serve requests until a None request is received. A request is one of
+    ('template', key, pickled GeometricField), ('forget', key), ('save',
+    jobId, key, block name, shape, dtype, name, save_model args, options),
+    or ('commit', jobId). Each job is answered with (jobId, ok, result or
+    exception).
+    """
+    from mapclientplugins.fieldworkmodelserialiserstep.durability import commit_all
+
+    templates = {}
+    for request in iter(requests.get, None):
+        if request[0] == 'template':
+            templates[request[1]] = pickle.loads(request[2])
+            continue
+        if request[0] == 'forget':
+            del templates[request[1]]
+            continue
+
+        jobId = request[1]
+        try:
+            if request[0] == 'commit':
+                result = commit_all()
+            else:
+                result = _save(templates[request[2]], *request[3:])
+        except Exception as e:
+            replies.put((jobId, False, _picklable(e)))
+        else:
+            replies.put((jobId, True, result))
+    commit_all()
+    replies.put(None)
+
+
+class ProcessWriter(object):
+    """
+    Bounded write-behind queue served by a worker process. submit()
+    blocks while max_pending writes are outstanding, which is also the
+    number of shared memory blocks and of ensemble templates kept.
+    Exceptions raised by queued
+    writes are re-raised from the next submit() or flush().
+    """
+
+    def __init__(self, max_pending=4):
+        # Forking a process that runs Qt, or any other threads, is not safe.
+        context = multiprocessing.get_context('spawn')
+        self._requests = context.Queue()
+        self._replies = context.Queue()
+        self._process = context.Process(target=_worker_main, args=(self._requests, self._replies),
+                                        name='fieldwork-writer', daemon=True)
+        self._process.start()
+
+        self._blocks = queue.Queue()
+        for _ in range(max_pending):
+            self._blocks.put(None)
+        self._templates = collections.OrderedDict()
+        self._maxTemplates = max_pending
+        self._jobs = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._errors = []
+        self._exited = None
+        self._receiver = threading.Thread(target=self._receive, name='fieldwork-writer-replies', daemon=True)
+        self._receiver.start()
+
+    def submit(self, gf, args, options, callback=None):
+        """
+        Queue save_model(gf, *args, **options) on the worker and return a
+        Future of its result. The parameters of gf are copied before
+        returning, so gf may change straight after. callback, if given,
+        is called with a copy of gf and the result once the write has
+        completed, on a thread of this process.
+        """
+        self.raise_errors()
+        params = gf.field_parameters
+        block = self._blocks.get()
+        try:
+            if block is None or block.size < params.nbytes:
+                if block is not None:
+                    _close_block(block)
+                    block.unlink()
+                block = shared_memory.SharedMemory(create=True, size=max(1, params.nbytes))
+            shared = np.ndarray(params.shape, dtype=params.dtype, buffer=block.buf)
+            shared[...] = params
+
+            key = self._sendTemplate(gf)
+            snapshot = copy.copy(gf)
+            snapshot.field_parameters = shared
+            future = Future()
+            jobId = next(self._ids)
+            with self._lock:
+                if self._exited is not None:
+                    raise self._exited
+                self._jobs[jobId] = (future, block, snapshot, callback)
+            self._requests.put(('save', jobId, key, block.name, params.shape, params.dtype.str,
+                                getattr(gf, 'name', None), args, options))
+        except Exception:
+            self._blocks.put(block)
+            raise
+        return future
+
+    def _sendTemplate(self, gf):
+        """
+        Send gf without its parameters to the worker, once per ensemble,
+        and return the key the worker knows it by. The least recently
+        used template is forgotten once max_pending are held; saves
+        already queued with it are served first, as requests are taken
+        in order.
+        """
+        ensemble = gf.ensemble_field_function
+        key = id(ensemble)
+        if key in self._templates:
+            self._templates.move_to_end(key)
+            return key
+
+        template = copy.copy(gf)
+        template.field_parameters = None
+        self._requests.put(('template', key, pickle.dumps(template)))
+        # Held so that the id is not reused by another ensemble.
+        self._templates[key] = ensemble
+        if len(self._templates) > self._maxTemplates:
+            evicted, _ = self._templates.popitem(last=False)
+            self._requests.put(('forget', evicted))
+        return key
+
+    def _receive(self):
+        while True:
+            try:
+                reply = self._replies.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                self._fail(RuntimeError('fieldwork writer process exited with code {}'.format(
+                    self._process.exitcode)))
+                return
+            if reply is None:
+                return
+
+            jobId, ok, value = reply
+            with self._lock:
+                future, block, snapshot, callback = self._jobs.pop(jobId)
+            if ok and callback is not None:
+                try:
+                    callback(snapshot, value)
+                except Exception as e:
+                    ok, value = False, e
+            snapshot = None
+            if block is not None:
+                self._blocks.put(block)
+            self._complete(future, ok, value)
+
+    def _complete(self, future, ok, value):
+        if ok:
+            future.set_result(value)
+        else:
+            with self._lock:
+                self._errors.append(value)
+            future.set_exception(value)
+
+    def _fail(self, error):
+        with self._lock:
+            self._exited = error
+            jobs = list(self._jobs.values())
+            self._jobs = {}
+        for future, block, _, _ in jobs:
+            if block is not None:
+                self._blocks.put(block)
+            self._complete(future, False, error)
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def flush(self):
+        """
+        Block until every queued write has completed and the worker has
+        committed any group fsync it holds, then raise the first error
+        encountered, if any.
+        """
+        future = Future()
+        jobId = next(self._ids)
+        with self._lock:
+            exited = self._exited
+            if exited is None:
+                self._jobs[jobId] = (future, None, None, None)
+            futures = [job[0] for job in self._jobs.values()]
+        if exited is None:
+            self._requests.put(('commit', jobId))
+        wait(futures)
+        self.raise_errors()
+        if exited is not None:
+            raise exited
+
+    def raise_errors(self):
+        with self._lock:
+            errors = self._errors
+            self._errors = []
+        if errors:
+            raise errors[0]
+
+    def shutdown(self):
+        if self._process.is_alive():
+            self._requests.put(None)
+        self._process.join()
+        self._receiver.join()
+        while not self._blocks.empty():
+            block = self._blocks.get_nowait()
+            if block is not None:
+                _close_block(block)
+                block.unlink()
+        self._requests.close()
+        self._replies.close()
@@ -0,0 +1,452 @@
+"""
+Model writing used by the Fieldwork Model Serialiser Step. Kept free
+of MAP Client and Qt imports so that it can run in worker threads
+and processes.
+"""
+
+import copy
+import os
+import shutil
+import tempfile
+import time
+
+from mapclientplugins.fieldworkmodelserialiserstep.checksum import file_checksum, sidecar_name, write_sidecar
+from mapclientplugins.fieldworkmodelserialiserstep.compression import compress_file, compressed_name, \
+    strip_extension
+from mapclientplugins.fieldworkmodelserialiserstep.durability import DEFAULT_GROUP_FILES, DEFAULT_GROUP_MILLIS, \
+    fsync_directory, fsync_file, get_group_commit, replace
+from mapclientplugins.fieldworkmodelserialiserstep.formats import EXTENSIONS, HEADER_EXTENSION, \
+    make_header, save_geof, save_parameters
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import DEFAULT_CONNECTIONS, DEFAULT_PART_BYTES, \
+    get_sink, is_object_url, join_url
+from mapclientplugins.fieldworkmodelserialiserstep.precision import quantise, round_significant
+from mapclientplugins.fieldworkmodelserialiserstep.store import get_store, link
+from mapclientplugins.fieldworkmodelserialiserstep.streaming import DEFAULT_CHUNK_BYTES, geof_streamable
+from mapclientplugins.fieldworkmodelserialiserstep.surface import DEFAULT_DISCRETISATION, SURFACE_EXTENSIONS, \
+    save_surfaces
+
+GF_EXTENSION = '.geof'
+ENSEMBLE_EXTENSION = '.ens'
+MESH_EXTENSION = '.mesh'
+TEXT_EXTENSIONS = (GF_EXTENSION, ENSEMBLE_EXTENSION, MESH_EXTENSION)
+
+
+def output_paths(gfFilename, ensFilename=None, meshFilename=None, path='', fmt='geof', compression='none',
+                 surfaces=()):
+    """
+    Return the files written by save_model for the given filenames,
+    starting with the parameter file of fmt and ending with the surface
+    files of surfaces. Filenames that are None are skipped. The text
+    files carry the extension of compression.
+    """
+    path = path or ''
+    paths = [os.path.join(path, gfFilename + EXTENSIONS[fmt])]
+    if fmt == 'npy':
+        paths.append(os.path.join(path, gfFilename + HEADER_EXTENSION))
+    if ensFilename is not None:
+        paths.append(os.path.join(path, ensFilename + ENSEMBLE_EXTENSION))
+    if meshFilename is not None:
+        paths.append(os.path.join(path, meshFilename + MESH_EXTENSION))
+    paths.extend(os.path.join(path, gfFilename + SURFACE_EXTENSIONS[s]) for s in surfaces)
+    return [compressed_name(p, compression) if p.endswith(TEXT_EXTENSIONS) else p for p in paths]
+
+
+def save_options(config, location=''):
+    """
+    Return the keyword arguments for save_model given by a step config.
+    location is the directory the shared store is relative to. Keys
+    missing from configs saved by older versions take the defaults of
+    the step.
+    """
+    options = {'fmt': config.get('Output Format', 'geof'),
+               'chunkBytes': int(config.get('Write Chunk Bytes', DEFAULT_CHUNK_BYTES)),
+               'precision': config.get('Precision', 'float64'),
+               'digits': int(config.get('Significant Digits', 0)),
+               'compression': config.get('Compression', 'none'),
+               'compressionLevel': config.get('Compression Level'),
+               'endpoint': config.get('Object Store Endpoint') or None,
+               'connections': int(config.get('Object Store Connections', DEFAULT_CONNECTIONS)),
+               'partBytes': int(config.get('Object Store Part Bytes', DEFAULT_PART_BYTES)),
+               'surfaces': tuple(config.get('Surface Formats', ())),
+               'discretisation': tuple(config.get('Surface Discretisation', DEFAULT_DISCRETISATION)),
+               'checksum': config.get('Checksum') or None,
+               'atomic': bool(config.get('Atomic Write', True)),
+               'durability': config.get('Durability', 'group'),
+               'groupFiles': int(config.get('Group Commit Files', DEFAULT_GROUP_FILES)),
+               'groupMillis': int(config.get('Group Commit Milliseconds', DEFAULT_GROUP_MILLIS))}
+    if config.get('Deduplicate'):
+        options['storeDir'] = os.path.join(location, config.get('Shared Store', 'fieldwork_store'))
+        options['linkMode'] = config.get('Store Links', 'hardlink')
+    return options
+
+
+def gias_filenames(path, *filenames):
+    """
+    Return filenames joined onto path, leaving None as None. gias3 opens
+    the .geof and .ens filenames it is given as they are and only joins
+    the .mesh filename onto its path argument, so every filename handed
+    to gias3 is joined here and its path argument left empty.
+    """
+    return [None if f is None else os.path.join(path or '', f) for f in filenames]
+
+
+def save_ensemble(gf, ensFilename, meshFilename, path=''):
+    """
+    Write only the ensemble and mesh of gf, as save_geometric_field
+    would alongside the .geof file.
+    """
+    ensFilename, meshFilename = gias_filenames(path, ensFilename, meshFilename)
+    if ensFilename is not None:
+        gf.ensemble_field_function.save_ensemble(ensFilename, meshFilename, '')
+    elif meshFilename is not None:
+        gf.ensemble_field_function.mesh.save_mesh(meshFilename, '')
+
+
+def _written_bytes(files):
+    # Linked files share their data with the store, so only count
+    # bytes for regular files that were created in place.
+    return sum(os.path.getsize(f) for f in files
+               if os.path.exists(f) and not os.path.islink(f) and os.stat(f).st_nlink == 1)
+
+
+def _timed(writes, files, fn, *args):
+    """
+    Call fn(*args) and append the files it wrote, their size and the
+    time taken to writes. Returns what fn returns.
+    """
+    start = time.perf_counter()
+    value = fn(*args)
+    seconds = time.perf_counter() - start
+    writes.append({'files': files, 'bytes': _written_bytes(files), 'seconds': seconds})
+    return value
+
+
+def save_model(gf, gfFilename, ensFilename=None, meshFilename=None, path='',
+               storeDir=None, linkMode='hardlink', fmt='geof', chunkBytes=DEFAULT_CHUNK_BYTES,
+               precision='float64', digits=0, compression='none', compressionLevel=None,
+               endpoint=None, connections=DEFAULT_CONNECTIONS, partBytes=DEFAULT_PART_BYTES,
+               surfaces=(), discretisation=DEFAULT_DISCRETISATION, checksum=None,
+               atomic=False, durability='none', groupFiles=DEFAULT_GROUP_FILES, groupMillis=DEFAULT_GROUP_MILLIS):
+    """
+    Write gf to disk and return a dict describing what was written:
+    the files, the number of bytes and the time taken in seconds.
+    'writes' breaks this down by underlying write call.
+
+    fmt selects the format of the nodal parameters, 'geof' for the
+    gias3 text format or one of the binary formats in formats.py. The
+    parameters are streamed to disk in chunks of chunkBytes, and a
+    .geof file is byte-identical to the one gias3 writes. Models gias3
+    would sort differently, with 10**8 or more nodes or over ten
+    dimensions, are written by gias3 itself. Binary parameters are
+    stored at precision (see precision.py), and .geof parameters are
+    written with digits significant figures if digits is non-zero,
+    which is recorded in the .geof file. Models written by gias3 are
+    only rounded to digits.
+
+    If storeDir is given the ensemble and mesh are written once into a
+    content-addressed store there, and the requested .ens and .mesh
+    files are linked to the stored copies. The result then also has
+    the stored files under 'ensemble' and 'mesh'.
+
+    If compression is not 'none' the .geof, .ens and .mesh files are
+    compressed at compressionLevel (see compression.py) as they are
+    copied from a local staging directory, so only compressed bytes
+    reach path. Links into the store are not compressed.
+
+    If path, or gfFilename when path is empty, is an s3:// URL the files
+    are written to a local staging directory and uploaded to the object
+    store at endpoint (see objectstore.py), with up to connections
+    concurrent requests of partBytes each. storeDir is ignored, and
+    'files' holds the URLs of the uploaded objects.
+
+    surfaces lists surface formats from surface.py that gf is also
+    exported to, named after gfFilename. gf is triangulated once at
+    discretisation for all of them.
+
+    If checksum names an algorithm of checksum.py, every file written
+    gets a checksum sidecar. The digests are under 'checksums' and the
+    sidecars under 'sidecars' of the result.
+
+    If atomic is True the files are written into a staging directory
+    beside the parameter file and renamed into place, parameter file
+    last, so no output is ever seen half-written. durability is a
+    policy of durability.py deciding when the files are fsynced, with
+    groupFiles and groupMillis bounding a 'group' commit. Neither
+    applies to object store uploads.
+    """
+    if is_object_url(path) or (not path and is_object_url(gfFilename)):
+        return _save_to_object_store(gf, gfFilename, ensFilename, meshFilename, path,
+                                     get_sink(endpoint, connections, partBytes), checksum,
+                                     fmt=fmt, chunkBytes=chunkBytes, precision=precision, digits=digits,
+                                     compression=compression, compressionLevel=compressionLevel,
+                                     surfaces=surfaces, discretisation=discretisation)
+
+    options = dict(storeDir=storeDir, linkMode=linkMode, fmt=fmt, chunkBytes=chunkBytes,
+                   precision=precision, digits=digits, compression=compression,
+                   compressionLevel=compressionLevel, surfaces=surfaces, discretisation=discretisation,
+                   checksum=checksum)
+    if atomic:
+        result = _save_atomic(gf, gfFilename, ensFilename, meshFilename, path, durability == 'file', **options)
+    else:
+        result = _save_local(gf, gfFilename, ensFilename, meshFilename, path, **options)
+        if checksum:
+            _write_sidecars(result, checksum)
+        if durability == 'file':
+            for f in result['files'] + result.get('sidecars', []):
+                fsync_file(f)
+
+    written = result['files'] + result.get('sidecars', [])
+    if durability == 'file':
+        for directory in set(os.path.dirname(os.path.abspath(f)) for f in written):
+            fsync_directory(directory)
+    elif durability == 'group':
+        get_group_commit(groupFiles, groupMillis).add(written)
+    elif durability != 'none':
+        raise ValueError('Unknown durability policy: ' + str(durability))
+    return result
+
+
+def _save_atomic(gf, gfFilename, ensFilename, meshFilename, path, fsync, **options):
+    """
+    Write into a staging directory beside the parameter file, fsync the
+    staged files if fsync is True, then rename them onto their targets.
+    """
+    # Uncompressed names, as links into the store are not compressed.
+    targets = output_paths(gfFilename, ensFilename, meshFilename, path, options['fmt'], surfaces=options['surfaces'])
+    staging = tempfile.mkdtemp(prefix='.fieldwork-', dir=os.path.dirname(os.path.abspath(targets[0])))
+    try:
+        names = [None if f is None else os.path.join(staging, os.path.basename(f))
+                 for f in (gfFilename, ensFilename, meshFilename)]
+        result = _save_local(gf, names[0], names[1], names[2], '', **options)
+        checksum = options['checksum']
+        if checksum:
+            _write_sidecars(result, checksum)
+
+        directories = dict((os.path.basename(target), os.path.dirname(target)) for target in targets)
+        moved = dict((staged, os.path.join(directories[os.path.basename(strip_extension(staged))],
+                                           os.path.basename(staged)))
+                     for staged in result['files'])
+        if checksum:
+            for staged in result['files']:
+                moved[sidecar_name(staged, checksum)] = sidecar_name(moved[staged], checksum)
+        if fsync:
+            for staged in moved:
+                fsync_file(staged)
+        # Parameter files last, so a model whose parameter file exists is complete.
+        parameters = result['files'][:1] + [f for f in result['files'][1:] if f.endswith(HEADER_EXTENSION)]
+        order = [f for f in result['files'] if f not in parameters] + parameters + result.get('sidecars', [])
+        for staged in order:
+            replace(staged, moved[staged])
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    result['writes'] = [dict(write, files=[moved.get(f, f) for f in write['files']]) for write in result['writes']]
+    if checksum:
+        result['checksums'] = dict((moved[f], digest) for f, digest in result['checksums'].items())
+        result['sidecars'] = [moved[f] for f in result['sidecars']]
+    result['files'] = [moved[f] for f in result['files']]
+    return result
+
+
+def _save_local(gf, gfFilename, ensFilename, meshFilename, path, compression='none', compressionLevel=None,
+                **options):
+    if compression != 'none':
+        return _save_compressed(gf, gfFilename, ensFilename, meshFilename, path, compression, compressionLevel,
+                                **options)
+    return _save_plain(gf, gfFilename, ensFilename, meshFilename, path, **options)
+
+
+def _save_plain(gf, gfFilename, ensFilename, meshFilename, path, storeDir=None, linkMode='hardlink', fmt='geof',
+                chunkBytes=DEFAULT_CHUNK_BYTES, precision='float64', digits=0,
+                surfaces=(), discretisation=DEFAULT_DISCRETISATION, checksum=None):
+    start = time.perf_counter()
+    path = path or ''
+    digests = {}
+    result = {}
+    writes = []
+    shared = storeDir is not None and (ensFilename is not None or meshFilename is not None)
+    if shared:
+        storeStart = time.perf_counter()
+        stored = get_store(storeDir).add(gf)
+        writes.append({'files': [stored['ensemble'], stored['mesh']], 'bytes': 0,
+                       'seconds': time.perf_counter() - storeStart, 'store': True})
+        result.update(stored)
+
+    parameterFiles = output_paths(gfFilename, None, None, path, fmt)
+    ensembleFiles = output_paths(gfFilename, ensFilename, meshFilename, path, fmt)[len(parameterFiles):]
+    if fmt == 'geof':
+        if not geof_streamable(gf.field_parameters):
+            if digits:
+                rounded = copy.copy(gf)
+                rounded.field_parameters = round_significant(gf.field_parameters, digits)
+                gf = rounded
+            if shared:
+                _timed(writes, parameterFiles, gf.save_geometric_field, *gias_filenames(path, gfFilename, None, None))
+            else:
+                _timed(writes, parameterFiles + ensembleFiles,
+                       gf.save_geometric_field, *gias_filenames(path, gfFilename, ensFilename, meshFilename))
+        else:
+            # As gias3 writes them: the ensemble first, then the .geof naming it.
+            # Named without the extension, as gias3 names it. The binary
+            # formats below refer to the same files.
+            ensembleField = None
+            if ensFilename is not None:
+                ensembleField = os.path.basename(ensFilename)
+                if shared and linkMode == 'none':
+                    ensembleField = os.path.splitext(stored['ensemble'])[0]
+            if not shared and ensembleFiles:
+                _timed(writes, ensembleFiles, save_ensemble, gf, ensFilename, meshFilename, path)
+            _timed(writes, parameterFiles, save_geof, os.path.join(path, gfFilename), gf, ensembleField,
+                   chunkBytes, digits, checksum, digests)
+    else:
+        # Referenced by base name, as gias3 refers to them from a .geof file.
+        ensRef = None if ensFilename is None else os.path.basename(ensFilename) + ENSEMBLE_EXTENSION
+        meshRef = None if meshFilename is None else os.path.basename(meshFilename) + MESH_EXTENSION
+        if shared and linkMode == 'none':
+            ensRef = stored['ensemble'] if ensFilename is not None else None
+            meshRef = stored['mesh'] if meshFilename is not None else None
+        params, info = quantise(gf.field_parameters, precision)
+        header = make_header(gf, params, ensRef, meshRef, info)
+        _timed(writes, parameterFiles,
+               save_parameters, os.path.join(path, gfFilename), params, header, fmt, chunkBytes, checksum, digests)
+        if not shared and ensembleFiles:
+            _timed(writes, ensembleFiles, save_ensemble, gf, ensFilename, meshFilename, path)
+
+    surfaceFiles = output_paths(gfFilename, None, None, path, fmt, surfaces=surfaces)[len(parameterFiles):]
+    if surfaceFiles:
+        _timed(writes, surfaceFiles, save_surfaces, gf, os.path.join(path, gfFilename), surfaces, discretisation)
+
+    files = list(parameterFiles)
+    if not shared:
+        files.extend(ensembleFiles)
+    else:
+        for name, extension, filename in (('ensemble', ENSEMBLE_EXTENSION, ensFilename),
+                                          ('mesh', MESH_EXTENSION, meshFilename)):
+            if filename is not None and linkMode != 'none':
+                target = os.path.join(path, filename + extension)
+                _timed(writes, [target], link, stored[name], target, linkMode)
+                files.append(target)
+    files.extend(surfaceFiles)
+    if checksum:
+        result['checksums'] = _checksums(files, digests, checksum, result)
+    seconds = time.perf_counter() - start
+
+    result.update({'files': files, 'bytes': sum(w['bytes'] for w in writes),
+                   'seconds': seconds, 'writes': writes})
+    return result
+
+
+def _checksums(files, digests, checksum, result):
+    """
+    Return the digest of each of files, taking those computed while
+    writing from digests and hashing the rest. Links into the store
+    are named by their SHA-256, so are not read again for sha256.
+    """
+    checksums = {}
+    for f in files:
+        if f in digests:
+            checksums[f] = digests[f]
+            continue
+        stored = [result[name] for name in ('ensemble', 'mesh') if name in result and os.path.exists(f) and
+                  os.path.samefile(result[name], f)]
+        if stored and checksum == 'sha256':
+            checksums[f] = os.path.splitext(os.path.basename(stored[0]))[0]
+        else:
+            checksums[f] = file_checksum(f, checksum)
+    return checksums
+
+
+def _write_sidecars(result, checksum):
+    """
+    Write the checksum sidecar of every file in result and add them to
+    its 'sidecars', 'writes' and 'bytes'.
+    """
+    sidecars = [sidecar_name(f, checksum) for f in result['files']]
+    start = time.perf_counter()
+    for f in result['files']:
+        write_sidecar(f, result['checksums'][f], checksum)
+    written = _written_bytes(sidecars)
+    result['writes'].append({'files': sidecars, 'bytes': written,
+                             'seconds': time.perf_counter() - start, 'checksum': True})
+    result['sidecars'] = sidecars
+    result['bytes'] += written
+
+
+def _save_compressed(gf, gfFilename, ensFilename, meshFilename, path, compression, level, **options):
+    """
+    Write into a staging directory, then move each file to path,
+    compressing the text files on the way. The staged writes are kept
+    in 'writes' for their time, without files or bytes, as only the
+    moved files reach path.
+    """
+    start = time.perf_counter()
+    staging = tempfile.mkdtemp(prefix='fieldwork-compress-')
+    try:
+        names = [None if f is None else os.path.join(staging, os.path.basename(f))
+                 for f in (gfFilename, ensFilename, meshFilename)]
+        result = _save_plain(gf, names[0], names[1], names[2], '', **options)
+        checksum = options.get('checksum')
+        checksums = {}
+        targets = dict((os.path.basename(f), f)
+                       for f in output_paths(gfFilename, ensFilename, meshFilename, path, options['fmt'],
+                                             surfaces=options['surfaces']))
+
+        writes = [dict(write, files=[], bytes=0, staged=True) for write in result['writes'] if not write.get('store')]
+        writes[:0] = [write for write in result['writes'] if write.get('store')]
+        files = []
+        for staged in result['files']:
+            target = targets[os.path.basename(staged)]
+            if os.path.islink(staged) or os.stat(staged).st_nlink > 1:
+                stored = result['ensemble'] if staged.endswith(ENSEMBLE_EXTENSION) else result['mesh']
+                _timed(writes, [target], link, stored, target, options['linkMode'])
+            elif staged.endswith(TEXT_EXTENSIONS):
+                target = compressed_name(target, compression)
+                digest = _timed(writes, [target], compress_file, staged, target, compression, level, checksum)
+                if checksum:
+                    result['checksums'][staged] = digest
+            else:
+                _timed(writes, [target], shutil.move, staged, target)
+            files.append(target)
+            if checksum:
+                checksums[target] = result['checksums'][staged]
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if checksum:
+        result['checksums'] = checksums
+    result.update({'files': files, 'bytes': sum(w['bytes'] for w in writes),
+                   'seconds': time.perf_counter() - start, 'writes': writes,
+                   'compression': compression})
+    return result
+
+
+def _save_to_object_store(gf, gfFilename, ensFilename, meshFilename, path, sink, checksum, **options):
+    """
+    Write into a staging directory, then upload every staged file, and
+    its checksum sidecar, to path, or to the directory of gfFilename if
+    path is empty.
+    """
+    start = time.perf_counter()
+    url = path or gfFilename.rpartition('/')[0]
+    staging = tempfile.mkdtemp(prefix='fieldwork-upload-')
+    try:
+        names = [None if f is None else os.path.join(staging, os.path.basename(f))
+                 for f in (gfFilename, ensFilename, meshFilename)]
+        result = _save_local(gf, names[0], names[1], names[2], '', checksum=checksum, **options)
+        staged = list(result['files'])
+        if checksum:
+            _write_sidecars(result, checksum)
+            staged.extend(result['sidecars'])
+        urls = [join_url(url, os.path.basename(f)) for f in staged]
+        writes = [dict(write, files=[], bytes=0, staged=True) for write in result['writes']]
+        writes.append(sink.upload(staged, urls))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    files = urls[:len(result['files'])]
+    if checksum:
+        result['checksums'] = dict(zip(files, (result['checksums'][f] for f in result['files'])))
+        result['sidecars'] = urls[len(files):]
+    result.update({'files': files, 'bytes': sum(w['bytes'] for w in writes),
+                   'seconds': time.perf_counter() - start, 'writes': writes})
+    return result
@@ -0,0 +1,124 @@
+"""
+Delta snapshots of a model saved repeatedly during a fit. The first save
+writes a full base model. Later saves of a model with the same ensemble
+write only the nodes whose parameters differ from the base, and any
+iteration can be rebuilt from its delta and the base.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from mapclientplugins.fieldworkmodelserialiserstep.compression import strip_extension, uncompressed
+from mapclientplugins.fieldworkmodelserialiserstep.formats import load_parameters
+
+DELTA_EXTENSION = '.delta.npz'
+NODE_BLOCK = 65536
+
+
+def load_base_parameters(baseFile, ensFilename=None, meshFilename=None):
+    """
+    Return the nodal parameters of a base model. A .geof base is read
+    through gias3, which needs the ensemble and mesh files of the model,
+    and is decompressed first if it was written compressed.
+    """
+    if strip_extension(baseFile).endswith('.geof'):
+        from gias3.fieldwork.field import geometric_field
+        with uncompressed(baseFile, ensFilename, meshFilename) as files:
+            gf = geometric_field.load_geometric_field(*files)
+        return gf.field_parameters
+    return np.asarray(load_parameters(baseFile, mmap=False)[0])
+
+
+def save_delta(filename, baseFile, baseParams, params, iteration):
+    """
+    Write the nodes of params that differ from baseParams to filename.
+    Nodes are indexed along axis 1 of the parameter array, and compared
+    in blocks so that no full-size temporary is made.
+    """
+    indices = []
+    for start in range(0, params.shape[1], NODE_BLOCK):
+        block = params[:, start:start + NODE_BLOCK] != baseParams[:, start:start + NODE_BLOCK]
+        changed = np.any(block.reshape(block.shape[0], block.shape[1], -1), axis=(0, 2))
+        indices.append(np.flatnonzero(changed) + start)
+    indices = np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32)
+    header = {
+        'base': os.path.relpath(baseFile, os.path.dirname(os.path.abspath(filename))),
+        'shape': list(params.shape),
+        'dtype': params.dtype.str,
+        'iteration': iteration,
+    }
+    with open(filename, 'wb') as f:
+        np.savez(f, indices=indices, values=params[:, indices], header=np.array(json.dumps(header)))
+    return len(indices)
+
+
+def reconstruct(deltaFile, ensFilename=None, meshFilename=None):
+    """
+    Rebuild the nodal parameters saved as deltaFile. ensFilename and
+    meshFilename are only needed when the base is a .geof file.
+    """
+    with np.load(deltaFile) as data:
+        header = json.loads(str(data['header']))
+        indices = data['indices']
+        values = data['values']
+    baseFile = os.path.join(os.path.dirname(os.path.abspath(deltaFile)), header['base'])
+    params = np.array(load_base_parameters(baseFile, ensFilename, meshFilename), dtype=header['dtype'])
+    params[:, indices] = values
+    return params
+
+
+class SnapshotSeries(object):
+    """
+    The base of a run of delta snapshots. A model continues the series
+    while it shares the ensemble object and parameter shape of the base
+    and the base file is still on disk; otherwise it becomes a new base.
+    """
+
+    def __init__(self):
+        self.baseFile = None
+        self.iteration = 0
+        self._baseParams = None
+        self._ensemble = None
+        self._lock = threading.Lock()
+
+    def matches(self, gf):
+        with self._lock:
+            return (self.baseFile is not None and os.path.exists(self.baseFile) and
+                    gf.ensemble_field_function is self._ensemble and
+                    gf.field_parameters.shape == self._baseParams.shape)
+
+    def set_base(self, gf, baseFile):
+        with self._lock:
+            self.baseFile = baseFile
+            self.iteration = 0
+            self._baseParams = np.array(gf.field_parameters, copy=True)
+            self._ensemble = gf.ensemble_field_function
+
+    def save(self, gf, gfFilename, path=''):
+        """
+        Write gf as a delta against the base and return a result dict in
+        the form returned by serialiser.save_model.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self.iteration += 1
+            iteration = self.iteration
+            baseFile = self.baseFile
+            baseParams = self._baseParams
+
+        target = os.path.join(path or '', gfFilename)
+        if os.path.splitext(baseFile)[0] == target:
+            # Saving over the base, number the deltas instead.
+            target = '{}.{:06d}'.format(target, iteration)
+        target += DELTA_EXTENSION
+        nodes = save_delta(target, baseFile, baseParams, gf.field_parameters, iteration)
+        seconds = time.perf_counter() - start
+        written = os.path.getsize(target)
+
+        return {'files': [target], 'bytes': written, 'seconds': seconds,
+                'writes': [{'files': [target], 'bytes': written, 'seconds': seconds}],
+                'base': baseFile, 'changed_nodes': nodes}
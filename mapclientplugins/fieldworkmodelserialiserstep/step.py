@@ -4,15 +4,49 @@ Saves a fieldwork geometric_field to disk. Inputs are a GF and
 a list of filenames for the GF, ensemble, mesh, and path. If
 list of filenames is input, they override the filenames in
 the plugin config. Filenames for ensemble, mesh, and path
-can be None in input list, or empty strings in config.
+can be None in input list, or empty strings in config. A dict
+or list of GFs can also be input, in which case each GF is
+written to filenames expanded from the batch filename template.
+The GF, the batch and the paths of the written files are
+provided to later steps.
 """
 
 import os
 
+import atexit
+import functools
 import json
+import logging
+import time
 
 from mapclient.mountpoints.workflowstep import WorkflowStepMountPoint
-from mapclientplugins.fieldworkmodelserialiserstep.configuredialog import ConfigureDialog
+from mapclientplugins.fieldworkmodelserialiserstep.archive import ModelArchive, stage_model
+from mapclientplugins.fieldworkmodelserialiserstep.batch import iter_models, save_batch
+from mapclientplugins.fieldworkmodelserialiserstep.compression import strip_extension
+from mapclientplugins.fieldworkmodelserialiserstep.durability import DEFAULT_GROUP_FILES, DEFAULT_GROUP_MILLIS
+from mapclientplugins.fieldworkmodelserialiserstep.fingerprint import FingerprintCache
+from mapclientplugins.fieldworkmodelserialiserstep.formats import EXTENSIONS
+from mapclientplugins.fieldworkmodelserialiserstep.journal import WriteJournal
+from mapclientplugins.fieldworkmodelserialiserstep.manifest import record_models
+from mapclientplugins.fieldworkmodelserialiserstep.metrics import MetricsFile, log_record, make_record
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import DEFAULT_CONNECTIONS, DEFAULT_PART_BYTES, \
+    is_object_url
+from mapclientplugins.fieldworkmodelserialiserstep.processwriter import ProcessWriter
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import output_paths, save_model, save_options
+from mapclientplugins.fieldworkmodelserialiserstep.snapshot import SnapshotSeries
+from mapclientplugins.fieldworkmodelserialiserstep.streaming import DEFAULT_CHUNK_BYTES
+from mapclientplugins.fieldworkmodelserialiserstep.surface import DEFAULT_DISCRETISATION
+from mapclientplugins.fieldworkmodelserialiserstep.validation import validate_config
+from mapclientplugins.fieldworkmodelserialiserstep.writer import BackgroundWriter, snapshot_geometric_field
+
+logger = logging.getLogger(__name__)
+
+
+def _absolute(location):
+    # Object store URLs are already absolute.
+    if location is None or is_object_url(location):
+        return location
+    return os.path.abspath(location)
 
 
 class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
@@ -42,6 +76,24 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#uses',
                       'python#string'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#uses',
+                      'ju#fieldworkmodeldict'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'ju#fieldworkmodel'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'python#string'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'python#string'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'python#string'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'ju#fieldworkmodeldict'))
 
         self._config = {}
         self._config['identifier'] = ''
@@ -49,12 +101,55 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         self._config['Ensemble Filename'] = ''
         self._config['Mesh Filename'] = ''
         self._config['Path'] = ''
+        self._config['Output Format'] = 'geof'
+        self._config['Write Chunk Bytes'] = DEFAULT_CHUNK_BYTES
+        self._config['Precision'] = 'float64'
+        self._config['Significant Digits'] = 0
+        self._config['Compression'] = 'none'
+        self._config['Compression Level'] = None
+        self._config['Surface Formats'] = []
+        self._config['Surface Discretisation'] = list(DEFAULT_DISCRETISATION)
+        self._config['Asynchronous Write'] = False
+        self._config['Writer Threads'] = 1
+        self._config['Writer Process'] = False
+        self._config['Write Queue Size'] = 4
+        self._config['Batch Filename Template'] = '{filename}_{name}'
+        self._config['Batch Workers'] = 4
+        self._config['Batch Pool'] = 'thread'
+        self._config['Deduplicate'] = False
+        self._config['Shared Store'] = 'fieldwork_store'
+        self._config['Store Links'] = 'hardlink'
+        self._config['Incremental'] = False
+        self._config['Incremental Tolerance'] = 0.0
+        self._config['Resume'] = False
+        self._config['Snapshot Mode'] = False
+        self._config['Archive'] = ''
+        self._config['Archive Flush Interval'] = 16
+        self._config['Metrics File'] = ''
+        self._config['Manifest'] = False
+        self._config['Checksum'] = ''
+        self._config['Atomic Write'] = True
+        self._config['Durability'] = 'group'
+        self._config['Group Commit Files'] = DEFAULT_GROUP_FILES
+        self._config['Group Commit Milliseconds'] = DEFAULT_GROUP_MILLIS
+        self._config['Object Store Endpoint'] = ''
+        self._config['Object Store Connections'] = DEFAULT_CONNECTIONS
+        self._config['Object Store Part Bytes'] = DEFAULT_PART_BYTES
+
+        self._writer = None
+        self._archive = None
+        self._metrics = None
+        self._fingerprints = None
+        self._snapshots = SnapshotSeries()
 
         self._GF = None
         self._GFFilename = None
         self._ensFilename = None
         self._meshFilename = None
         self._path = None
+        self._GFBatch = None
+        self._batchResults = None
+        self._outputPaths = (None, None, None)
 
     def execute(self):
         """
@@ -63,10 +158,175 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         may be connected up to a button in a widget for example.
         """
         # Put your execute step code here before calling the '_doneExecution' method.
-        if self._GFFilename is not None:
-            gfFilename = os.path.join(self._location, self._GFFilename)
+        gfFilename, ensFilename, meshFilename, path = self._resolveFilenames()
+
+        fingerprints = self._getFingerprints()
+        # Batch models have no single path, so batch-only executions provide None.
+        self._outputPaths = (None, None, None)
+        if self._GF is not None:
+            gfPath = output_paths(gfFilename, None, None, path, self._config['Output Format'],
+                                  self._config['Compression'])[0]
+            self._outputPaths = self._predictedPaths(gfFilename, ensFilename, meshFilename, path)
+            if fingerprints is not None and fingerprints.unchanged(gfPath, self._GF.field_parameters):
+                logger.info('fieldwork model unchanged, skipping: %s', gfPath)
+            else:
+                logger.info('serialising fieldwork model to: %s', gfFilename + EXTENSIONS[self._config['Output Format']])
+                if ensFilename is not None:
+                    logger.info('  ensemble: %s', ensFilename + '.ens')
+                if meshFilename is not None:
+                    logger.info('  mesh: %s', meshFilename + '.mesh')
+                if path != '':
+                    logger.info('  path: %s', path)
+
+                if self._config['Asynchronous Write']:
+                    # Blocks if the write queue is full, and re-raises any error
+                    # from a previously queued write. The queue wait recorded in
+                    # the metrics includes any time spent blocked here.
+                    queuedAt = time.perf_counter()
+                    writer = self._getWriter()
+                    if isinstance(writer, ProcessWriter):
+                        writer.submit(self._GF, (gfFilename, ensFilename, meshFilename, path), self._saveOptions(),
+                                      callback=functools.partial(self._processWriteDone, queuedAt))
+                    else:
+                        gf = snapshot_geometric_field(self._GF)
+                        writer.submit(self._saveModel, gf, gfFilename, ensFilename, meshFilename, path, queuedAt)
+                else:
+                    self._saveModel(self._GF, gfFilename, ensFilename, meshFilename, path)
+
+        if self._GFBatch is not None:
+            self._executeBatch(gfFilename, ensFilename, meshFilename, path)
+
+        if fingerprints is not None:
+            logger.info('incremental: %d unchanged models skipped, %d written',
+                        fingerprints.hits, fingerprints.misses)
+
+        self._doneExecution()
+
+    def _saveModel(self, gf, gfFilename, ensFilename, meshFilename, path, queuedAt=None):
+        extra = {}
+        if queuedAt is not None:
+            extra['queue_wait'] = time.perf_counter() - queuedAt
+
+        archive = self._getArchive()
+        if archive is not None:
+            result = stage_model(gf, gfFilename, ensFilename, meshFilename, **self._saveOptions())
+            # Measure the staged files before they are moved into the archive.
+            record = make_record(self.getIdentifier(), gf, result, **extra)
+            result['record'] = archive.append_staged(os.path.basename(gfFilename), result)
+            record['record'] = result['record']
+            self._outputPaths = (os.path.abspath(archive.filename), None, None)
+            self._emitMetrics(record)
+            return result
+
+        if self._config['Snapshot Mode'] and self._snapshots.matches(gf):
+            result = self._snapshots.save(gf, gfFilename, path)
         else:
-            gfFilename = os.path.join(self._location, self._config['GF Filename'])
+            result = save_model(gf, gfFilename, ensFilename, meshFilename, path, **self._saveOptions())
+            if self._config['Snapshot Mode']:
+                self._snapshots.set_base(gf, result['files'][0])
+            if self._fingerprints is not None:
+                self._fingerprints.record(result['files'][0], gf.field_parameters, result['files'])
+        self._modelWritten(gf, result, extra)
+        return result
+
+    def _processWriteDone(self, queuedAt, gf, result):
+        """
+        Called by the ProcessWriter once the worker process has written gf.
+        The queue wait is the time from queuing to completion less the
+        time the worker spent writing.
+        """
+        if self._fingerprints is not None:
+            self._fingerprints.record(result['files'][0], gf.field_parameters, result['files'])
+        extra = {'queue_wait': max(0.0, time.perf_counter() - queuedAt - result['seconds'])}
+        self._modelWritten(gf, result, extra)
+
+    def _modelWritten(self, gf, result, extra):
+        self._recordManifest([(gf, result)])
+        self._outputPaths = self._resultPaths(result)
+        self._emitMetrics(make_record(self.getIdentifier(), gf, result, **extra))
+
+    def _predictedPaths(self, gfFilename, ensFilename, meshFilename, path):
+        """
+        Return the absolute paths of the parameter, ensemble and mesh files
+        that a write of the given filenames produces. Used for models that
+        are skipped as unchanged, until a write reports its actual files.
+        """
+        if self._config['Archive'] != '':
+            return os.path.abspath(os.path.join(self._location, self._config['Archive'])), None, None
+        fmt = self._config['Output Format']
+        if is_object_url(path):
+            # Uploads keep only the base name of the GF filename.
+            gfFilename = os.path.basename(gfFilename)
+        compression = self._config['Compression']
+        files = output_paths(gfFilename, None, None, path, fmt, compression)
+        ensemble = output_paths(gfFilename, ensFilename, None, path, fmt, compression)[len(files):]
+        mesh = output_paths(gfFilename, None, meshFilename, path, fmt, compression)[len(files):]
+        return (_absolute(files[0]),
+                _absolute(ensemble[0]) if ensemble else None,
+                _absolute(mesh[0]) if mesh else None)
+
+    def _resultPaths(self, result):
+        """
+        Return the absolute paths of the parameter, ensemble and mesh files
+        from a save result. With Store Links set to none these are the
+        files in the shared store.
+        """
+        ensemble = [f for f in result['files'] if strip_extension(f).endswith('.ens')] or [result.get('ensemble')]
+        mesh = [f for f in result['files'] if strip_extension(f).endswith('.mesh')] or [result.get('mesh')]
+        return tuple(_absolute(f) for f in (result['files'][0], ensemble[0], mesh[0]))
+
+    def _recordManifest(self, models):
+        """
+        Add written (gf, result) pairs to the manifest of their output
+        directory, if enabled. Uploaded models are not recorded.
+        """
+        if self._config['Manifest']:
+            record_models([(gf, result) for gf, result in models if not is_object_url(result['files'][0])])
+
+    def _emitMetrics(self, record):
+        log_record(record)
+        metrics = self._getMetricsFile()
+        if metrics is not None:
+            metrics.write(record)
+
+    def _getMetricsFile(self):
+        """
+        Return the JSON-lines file metrics are appended to, or None if
+        metrics are only logged.
+        """
+        if self._config['Metrics File'] == '':
+            return None
+        filename = os.path.join(self._location, self._config['Metrics File'])
+        if self._metrics is None or self._metrics.filename != filename:
+            self._metrics = MetricsFile(filename)
+        return self._metrics
+
+    def _getFingerprints(self):
+        """
+        Return the write journal if resuming is on, the fingerprint cache
+        if incremental saving is on, otherwise None. The cache lives as
+        long as the step so that it spans every iteration of a looped
+        workflow.
+        """
+        if self._config['Resume']:
+            if not isinstance(self._fingerprints, WriteJournal):
+                self._fingerprints = WriteJournal()
+            return self._fingerprints
+        if not self._config['Incremental']:
+            return None
+        if not isinstance(self._fingerprints, FingerprintCache):
+            self._fingerprints = FingerprintCache()
+        self._fingerprints.tolerance = float(self._config['Incremental Tolerance'])
+        return self._fingerprints
+
+    def _resolveFilenames(self):
+        """
+        Return the gf, ensemble and mesh filenames and the path to write
+        to. Filenames from the input ports override those in the config.
+        """
+        gfFilename = self._GFFilename if self._GFFilename is not None else self._config['GF Filename']
+        if not is_object_url(gfFilename):
+            gfFilename = os.path.join(self._location, gfFilename)
 
         if self._ensFilename is not None:
             ensFilename = self._ensFilename
@@ -89,17 +349,112 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         else:
             path = self._config['Path']
 
-        print('serialising fieldwork model to:')
-        print(gfFilename + '.geof')
-        if ensFilename != None:
-            print(ensFilename + '.ens')
-        if meshFilename != None:
-            print(meshFilename + '.mesh')
-        if path != '':
-            print('path: ' + path)
+        return gfFilename, ensFilename, meshFilename, path
 
-        self._GF.save_geometric_field(gfFilename, ensFilename, meshFilename, path)
-        self._doneExecution()
+    def _saveOptions(self):
+        """
+        Return the keyword arguments for save_model given by the config.
+        """
+        return save_options(self._config, self._location)
+
+    def _executeBatch(self, gfFilename, ensFilename, meshFilename, path):
+        logger.info('serialising %d fieldwork models to: %s', len(self._GFBatch),
+                    self._config['Batch Filename Template'].format(filename=gfFilename, name='<name>', index='<index>') +
+                    EXTENSIONS[self._config['Output Format']])
+
+        self._batchResults, summary = save_batch(
+            self._GFBatch, gfFilename, ensFilename, meshFilename, path,
+            self._config['Batch Filename Template'],
+            workers=int(self._config['Batch Workers']),
+            pool=self._config['Batch Pool'],
+            fingerprints=self._getFingerprints(),
+            archive=self._getArchive(),
+            **self._saveOptions())
+
+        models = dict(iter_models(self._GFBatch))
+        written = []
+        for name, result in self._batchResults.items():
+            if 'error' in result:
+                logger.error('  %s: FAILED %s', name, result['error'])
+            elif result.get('skipped'):
+                logger.info('  %s: unchanged, skipped', name)
+            else:
+                self._emitMetrics(make_record(self.getIdentifier(), models[name], result,
+                                              batch=name, record=result.get('record')))
+                written.append((models[name], result))
+        if self._getArchive() is None:
+            self._recordManifest(written)
+        logger.info('wrote {models} models ({bytes} bytes) in {seconds:.3f} s: '
+                    '{models_per_second:.1f} models/s, {megabytes_per_second:.1f} MB/s'.format(**summary))
+        metrics = self._getMetricsFile()
+        if metrics is not None:
+            metrics.write(dict(summary, time=time.time(), step=self.getIdentifier(), batch_summary=True))
+
+        if summary['failed']:
+            raise RuntimeError('{} of {} fieldwork models failed to serialise'.format(
+                summary['failed'], summary['models']))
+
+    def _getWriter(self):
+        """
+        Return the asynchronous writer: a ProcessWriter if Writer Process
+        is set, except for archives and snapshots, which are kept in this
+        process, otherwise a BackgroundWriter.
+        """
+        if self._writer is None:
+            if self._config['Writer Process'] and self._config['Archive'] == '' and \
+                    not self._config['Snapshot Mode']:
+                self._writer = ProcessWriter(max_pending=int(self._config['Write Queue Size']))
+            else:
+                self._writer = BackgroundWriter(max_workers=int(self._config['Writer Threads']),
+                                                max_pending=int(self._config['Write Queue Size']))
+            atexit.register(self.flush)
+        return self._writer
+
+    def _getArchive(self):
+        """
+        Return the archive models are appended to, or None if models are
+        written as separate files.
+        """
+        if self._config['Archive'] == '':
+            return None
+        if self._archive is None:
+            self._archive = ModelArchive(os.path.join(self._location, self._config['Archive']),
+                                         flushEvery=int(self._config['Archive Flush Interval']))
+            atexit.register(self.flush)
+        return self._archive
+
+    def wait(self):
+        '''
+        Wait for any queued asynchronous writes to reach disk and write
+        the index of the archive, if any, keeping both for later
+        executions. Raises the first error from a failed write.
+        '''
+        if self._writer is not None:
+            self._writer.flush()
+        if self._archive is not None:
+            self._archive.flush()
+
+    def flush(self):
+        '''
+        Wait for any queued asynchronous writes to reach disk and close
+        the archive, if any. Raises the first error from a failed write.
+        The writer and archive are discarded so that a changed
+        configuration takes effect on the next execution.
+        '''
+        writer = self._writer
+        archive = self._archive
+        self._writer = None
+        self._archive = None
+        atexit.unregister(self.flush)
+        try:
+            if writer is not None:
+                try:
+                    writer.flush()
+                finally:
+                    writer.shutdown()
+        finally:
+            if archive is not None:
+                archive.close()
 
     def setPortData(self, index, data_in):
         """
@@ -115,8 +470,35 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
             self._ensFilename = data_in  # String
         elif index == 3:
             self._meshFilename = data_in  # String
+        elif index == 4:
+            self._path = data_in  # String
         else:
-            self._path = data_in
+            self._GFBatch = data_in  # dict or list of ju fieldworkmodels
+
+    def getPortData(self, index):
+        '''
+        Add your code here that will return the appropriate objects for this step.
+        The index is the index of the port in the port list.  If there is only one
+        provides port for this step then the index can be ignored.
+
+        The model and batch are passed on as the same objects that were
+        input. The file paths are those of the single model input, and
+        are only returned once any queued asynchronous write has reached
+        disk. They are None after an execution with only a batch input,
+        whose files are listed in the manifest or archive.
+        '''
+        if index == 6:
+            return self._GF  # ju fieldworkmodel
+        elif index == 10:
+            return self._GFBatch  # dict or list of ju fieldworkmodels
+
+        self.wait()
+        if index == 7:
+            return self._outputPaths[0]  # String, .geof/.npz/.npy file
+        elif index == 8:
+            return self._outputPaths[1]  # String, .ens file
+        else:
+            return self._outputPaths[2]  # String, .mesh file
 
     def configure(self):
         '''
@@ -126,6 +508,9 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         then set:
             self._configured = True
         '''
+        # Imported here so that discovering the plugin does not load Qt.
+        from mapclientplugins.fieldworkmodelserialiserstep.configuredialog import ConfigureDialog
+
         dlg = ConfigureDialog(self._main_window)
         dlg.setWorkflowLocation(self._location)
         dlg.identifierOccursCount = self._identifierOccursCount
@@ -134,6 +519,7 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         dlg.setModal(True)
 
         if dlg.exec_():
+            self.flush()
             self._config = dlg.getConfig()
 
         self._configured = dlg.validate()
@@ -163,10 +549,8 @@ class FieldworkModelSerialiserStep(WorkflowStepMountPoint):
         Add code to deserialize this step from disk. Parses a json string
         given by mapclient
         '''
+        self.flush()
         self._config.update(json.loads(string))
 
-        d = ConfigureDialog()
-        d.setWorkflowLocation(self._location)
-        d.identifierOccursCount = self._identifierOccursCount
-        d.setConfig(self._config)
-        self._configured = d.validate()
+        self._configured = validate_config(self._config, self._location, self._identifierOccursCount,
+                                           self._config['identifier'])[0]
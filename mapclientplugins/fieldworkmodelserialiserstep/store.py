@@ -0,0 +1,114 @@
+"""
+Content-addressed store for ensemble and mesh files. Models built from
+the same template share identical .ens and .mesh files, so each unique
+file is written once into the store under the hash of its contents and
+models refer to it through a link.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+LINK_MODES = ('hardlink', 'symlink', 'none')
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root):
+    """
+    Return the EnsembleStore for root, shared by every writer in this
+    process so that each ensemble is hashed at most once.
+    """
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = EnsembleStore(root)
+        return _stores[root]
+
+
+def file_digest(filename, blocksize=1 << 20):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def link(source, target, mode='hardlink'):
+    """
+    Make target refer to source. Hard links fall back to symbolic links
+    when the store and target are on different filesystems. Mode 'none'
+    leaves target untouched.
+    """
+    if mode == 'none':
+        return
+    if mode not in LINK_MODES:
+        raise ValueError('Unknown link mode: ' + str(mode))
+
+    if os.path.lexists(target):
+        if os.path.exists(target) and os.path.samefile(source, target):
+            return
+        os.remove(target)
+
+    if mode == 'hardlink':
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    os.symlink(os.path.abspath(source), target)
+
+
+class EnsembleStore(object):
+    """
+    A directory of .ens and .mesh files named by the SHA-256 of their
+    contents. Digests are remembered per ensemble_field_function object,
+    so an ensemble shared by many GeometricFields is only written and
+    hashed once. An ensemble modified in place after it has been stored
+    is not detected.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._known = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def add(self, gf):
+        """
+        Store the ensemble and mesh of gf if they are not already present.
+        Returns a dict with the stored 'ensemble' and 'mesh' files.
+        """
+        ensemble = gf.ensemble_field_function
+        with self._lock:
+            stored = self._known.get(ensemble)
+            if stored is None:
+                stored = self._write(ensemble)
+                self._known[ensemble] = stored
+        return stored
+
+    def _write(self, ensemble):
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='fieldwork-store-')
+        try:
+            # Fixed names, so that any mesh reference written into the
+            # .ens file does not change its hash. gias3 writes the .ens
+            # file to the name it is given, so both are full paths.
+            ensemble.save_ensemble(os.path.join(staging, 'ensemble'), os.path.join(staging, 'mesh'), '')
+            stored = {}
+            for name, extension in (('ensemble', '.ens'), ('mesh', '.mesh')):
+                source = os.path.join(staging, name + extension)
+                target = os.path.join(self.root, file_digest(source) + extension)
+                if not os.path.exists(target):
+                    # Copy then rename so that concurrent writers of the
+                    # same content never expose a partial file.
+                    partial = '{}.{}.partial'.format(target, os.getpid())
+                    shutil.copyfile(source, partial)
+                    os.replace(partial, target)
+                stored[name] = target
+            return stored
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,112 @@
+"""
+Bounded-memory writing of nodal parameter arrays. Arrays are written to
+any file object in fixed-size chunks taken directly from the array
+buffer, so the extra memory used is at most one chunk whatever the size
+of the mesh. The .npy output is byte-identical to numpy.save, and the
+.geof output to GeometricField.save_geometric_field of gias3.
+"""
+
+import json
+import os
+import zipfile
+
+import numpy as np
+
+DEFAULT_CHUNK_BYTES = 4 << 20
+
+# How gias3 names and formats the nodal parameters of a .geof file.
+GEOF_NODE = '        "node {:08d}": {{\n{}\n        }}'
+GEOF_DIM = '            "dim {:1d}": "{}"'
+GEOF_NUMBER = '{:20.16E}'
+
+
+def iter_chunks(array, chunkBytes=DEFAULT_CHUNK_BYTES):
+    """
+    Yield the bytes of array in the order numpy.save writes them: C
+    order, or Fortran order for arrays that are only Fortran-contiguous.
+    Contiguous arrays are sliced without copying.
+    """
+    fortran = array.flags.f_contiguous and not array.flags.c_contiguous
+    if array.flags.c_contiguous or fortran:
+        raw = array.reshape(-1, order='F' if fortran else 'C').view(np.uint8)
+        step = max(array.itemsize, chunkBytes - chunkBytes % array.itemsize)
+        for start in range(0, raw.size, step):
+            yield raw[start:start + step].data
+    else:
+        buffersize = max(1, chunkBytes // array.itemsize)
+        for chunk in np.nditer(array, flags=['external_loop', 'buffered', 'zerosize_ok'],
+                               buffersize=buffersize, order='C'):
+            yield chunk.tobytes('C')
+
+
+def write_npy(f, array, chunkBytes=DEFAULT_CHUNK_BYTES):
+    """
+    Write array to the file object f in .npy format.
+    """
+    np.lib.format.write_array_header_1_0(f, np.lib.format.header_data_from_array_1_0(array))
+    for chunk in iter_chunks(array, chunkBytes):
+        f.write(chunk)
+
+
+def write_npz(f, arrays, compress=True, chunkBytes=DEFAULT_CHUNK_BYTES):
+    """
+    Write a dict of arrays to the filename or file object f as a .npz
+    archive that numpy.load can read, streaming each array into its
+    zip member.
+    """
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(f, mode='w', compression=compression, allowZip64=True) as archive:
+        for name, array in arrays.items():
+            with archive.open(name + '.npy', mode='w', force_zip64=True) as member:
+                write_npy(member, np.asanyarray(array), chunkBytes)
+
+
+def geof_streamable(params):
+    """
+    Return True if write_geof reproduces gias3 for params. gias3 sorts
+    the node and dim keys as strings, which only matches their numeric
+    order below 10**8 nodes and up to 10 dimensions.
+    """
+    return params.ndim == 3 and 0 < params.shape[0] <= 10 and 0 < params.shape[1] < 10 ** 8
+
+
+def write_geof(f, gf, ensembleField=None, chunkBytes=DEFAULT_CHUNK_BYTES, digits=0):
+    """
+    Write gf to the binary file object f in the .geof JSON format, as
+    gias3 writes it with json.dump(indent=4, sort_keys=True), naming
+    ensembleField as its ensemble. The nodal parameters are formatted a
+    chunk of about chunkBytes of text at a time. Only the .geof file is
+    written; gf.field_parameters must pass geof_streamable.
+
+    If digits is non-zero each number is written with that many
+    significant figures instead, and digits is recorded under
+    'significant_digits', which gias3 ignores when loading.
+    """
+    def write(text):
+        # gias3 writes in text mode, so newlines are translated.
+        f.write(text.replace('\n', os.linesep).encode('ascii'))
+
+    meta = {'name': gf.name, 'dimensions': gf.dimensions,
+            'ensemble_point_counter': gf.ensemble_point_counter, 'field_parameters': {}}
+    if ensembleField is not None:
+        meta['ensemble_field'] = ensembleField
+    number = GEOF_NUMBER
+    if digits:
+        meta['significant_digits'] = digits
+        number = '{{:.{:d}E}}'.format(digits - 1)
+    head, key, tail = json.dumps(meta, indent=4, sort_keys=True).partition('"field_parameters": {}')
+
+    params = gf.field_parameters
+    dims, nodes, values = params.shape
+    nodeBytes = dims * (len(GEOF_DIM) + (len(number.format(0.0)) + 1) * values) + len(GEOF_NODE)
+    step = max(1, chunkBytes // nodeBytes)
+    write(head + key[:-1] + '\n')
+    for start in range(0, nodes, step):
+        chunk = params[:, start:start + step, :].tolist()
+        blocks = []
+        for i in range(len(chunk[0])):
+            lines = ',\n'.join(GEOF_DIM.format(dim, ' '.join(number.format(x) for x in chunk[dim][i]))
+                               for dim in range(dims))
+            blocks.append(GEOF_NODE.format(start + i, lines))
+        write((',\n' if start else '') + ',\n'.join(blocks))
+    write('\n    }' + tail)
@@ -0,0 +1,87 @@
+"""
+Surface mesh export of a GeometricField for visualisation and FE
+pre-processing. The field is triangulated once by gias3 at a given
+discretisation, and the same points and triangles are written to every
+requested format with numpy, without a per-vertex Python loop.
+
+vtk : legacy VTK POLYDATA, binary.
+ply : binary little-endian PLY.
+stl : binary STL.
+"""
+
+import numpy as np
+
+SURFACE_FORMATS = ('vtk', 'ply', 'stl')
+SURFACE_EXTENSIONS = {'vtk': '.vtk', 'ply': '.ply', 'stl': '.stl'}
+DEFAULT_DISCRETISATION = (10, 10)
+
+
+def triangulate(gf, discretisation=DEFAULT_DISCRETISATION):
+    """
+    Return (points, triangles) of gf evaluated at discretisation, as an
+    (n, 3) float array and an (m, 3) int32 array.
+    """
+    points, triangles = gf.triangulate(list(discretisation), merge=True)
+    return np.asarray(points, dtype=np.float64), np.asarray(triangles, dtype=np.int32)
+
+
+def write_vtk(filename, points, triangles, name='fieldwork'):
+    polygons = np.empty((len(triangles), 4), dtype='>i4')
+    polygons[:, 0] = 3
+    polygons[:, 1:] = triangles
+    with open(filename, 'wb') as f:
+        f.write('# vtk DataFile Version 3.0\n{}\nBINARY\nDATASET POLYDATA\nPOINTS {} double\n'.format(
+            name, len(points)).encode('ascii'))
+        f.write(points.astype('>f8').tobytes())
+        f.write('\nPOLYGONS {} {}\n'.format(len(triangles), polygons.size).encode('ascii'))
+        f.write(polygons.tobytes())
+        f.write(b'\n')
+
+
+def write_ply(filename, points, triangles, name='fieldwork'):
+    faces = np.empty(len(triangles), dtype=[('count', 'u1'), ('vertices', '<i4', (3,))])
+    faces['count'] = 3
+    faces['vertices'] = triangles
+    with open(filename, 'wb') as f:
+        f.write('ply\nformat binary_little_endian 1.0\ncomment {}\n'
+                'element vertex {}\nproperty double x\nproperty double y\nproperty double z\n'
+                'element face {}\nproperty list uchar int vertex_indices\nend_header\n'.format(
+                    name, len(points), len(triangles)).encode('ascii'))
+        f.write(points.astype('<f8').tobytes())
+        f.write(faces.tobytes())
+
+
+def write_stl(filename, points, triangles, name='fieldwork'):
+    corners = points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records = np.zeros(len(triangles), dtype=[('normal', '<f4', (3,)), ('corners', '<f4', (3, 3)),
+                                              ('attribute', '<u2')])
+    records['normal'] = normals
+    records['corners'] = corners
+    with open(filename, 'wb') as f:
+        f.write(name.encode('ascii', 'replace')[:80].ljust(80, b'\0'))
+        f.write(np.uint32(len(triangles)).astype('<u4').tobytes())
+        f.write(records.tobytes())
+
+
+_WRITERS = {'vtk': write_vtk, 'ply': write_ply, 'stl': write_stl}
+
+
+def save_surfaces(gf, filename, formats, discretisation=DEFAULT_DISCRETISATION):
+    """
+    Triangulate gf once and write it to filename plus the extension of
+    each of formats. Returns the list of files written.
+    """
+    for fmt in formats:
+        if fmt not in _WRITERS:
+            raise ValueError('Unknown surface format: ' + str(fmt))
+    points, triangles = triangulate(gf, discretisation)
+    name = str(getattr(gf, 'name', None) or 'fieldwork')
+    files = []
+    for fmt in formats:
+        target = filename + SURFACE_EXTENSIONS[fmt]
+        _WRITERS[fmt](target, points, triangles, name)
+        files.append(target)
+    return files
@@ -15,16 +15,16 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QAbstractButton, QApplication, QDialog, QDialogButtonBox,
-    QFormLayout, QGridLayout, QGroupBox, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QSizePolicy,
-    QWidget)
+from PySide6.QtWidgets import (QAbstractButton, QApplication, QCheckBox, QComboBox,
+    QDialog, QDialogButtonBox, QFormLayout, QGridLayout,
+    QGroupBox, QHBoxLayout, QLabel, QLineEdit,
+    QPushButton, QSizePolicy, QSpinBox, QWidget)
 
 class Ui_Dialog(object):
     def setupUi(self, Dialog):
         if not Dialog.objectName():
             Dialog.setObjectName(u"Dialog")
-        Dialog.resize(524, 288)
+        Dialog.resize(524, 438)
         self.gridLayout = QGridLayout(Dialog)
         self.gridLayout.setObjectName(u"gridLayout")
         self.configGroupBox = QGroupBox(Dialog)
@@ -61,6 +61,68 @@ class Ui_Dialog(object):
 
         self.formLayout.setWidget(4, QFormLayout.LabelRole, self.label4)
 
+        self.label5 = QLabel(self.configGroupBox)
+        self.label5.setObjectName(u"label5")
+
+        self.formLayout.setWidget(5, QFormLayout.LabelRole, self.label5)
+
+        self.asyncCheckBox = QCheckBox(self.configGroupBox)
+        self.asyncCheckBox.setObjectName(u"asyncCheckBox")
+
+        self.formLayout.setWidget(5, QFormLayout.FieldRole, self.asyncCheckBox)
+
+        self.label6 = QLabel(self.configGroupBox)
+        self.label6.setObjectName(u"label6")
+
+        self.formLayout.setWidget(6, QFormLayout.LabelRole, self.label6)
+
+        self.formatComboBox = QComboBox(self.configGroupBox)
+        self.formatComboBox.addItem("")
+        self.formatComboBox.addItem("")
+        self.formatComboBox.addItem("")
+        self.formatComboBox.setObjectName(u"formatComboBox")
+
+        self.formLayout.setWidget(6, QFormLayout.FieldRole, self.formatComboBox)
+
+        self.label7 = QLabel(self.configGroupBox)
+        self.label7.setObjectName(u"label7")
+
+        self.formLayout.setWidget(7, QFormLayout.LabelRole, self.label7)
+
+        self.precisionComboBox = QComboBox(self.configGroupBox)
+        self.precisionComboBox.addItem("")
+        self.precisionComboBox.addItem("")
+        self.precisionComboBox.addItem("")
+        self.precisionComboBox.addItem("")
+        self.precisionComboBox.setObjectName(u"precisionComboBox")
+
+        self.formLayout.setWidget(7, QFormLayout.FieldRole, self.precisionComboBox)
+
+        self.label8 = QLabel(self.configGroupBox)
+        self.label8.setObjectName(u"label8")
+
+        self.formLayout.setWidget(8, QFormLayout.LabelRole, self.label8)
+
+        self.digitsSpinBox = QSpinBox(self.configGroupBox)
+        self.digitsSpinBox.setObjectName(u"digitsSpinBox")
+        self.digitsSpinBox.setMaximum(17)
+
+        self.formLayout.setWidget(8, QFormLayout.FieldRole, self.digitsSpinBox)
+
+        self.label9 = QLabel(self.configGroupBox)
+        self.label9.setObjectName(u"label9")
+
+        self.formLayout.setWidget(9, QFormLayout.LabelRole, self.label9)
+
+        self.compressionComboBox = QComboBox(self.configGroupBox)
+        self.compressionComboBox.addItem("")
+        self.compressionComboBox.addItem("")
+        self.compressionComboBox.addItem("")
+        self.compressionComboBox.addItem("")
+        self.compressionComboBox.setObjectName(u"compressionComboBox")
+
+        self.formLayout.setWidget(9, QFormLayout.FieldRole, self.compressionComboBox)
+
         self.horizontalLayout = QHBoxLayout()
         self.horizontalLayout.setObjectName(u"horizontalLayout")
         self.gfLocLineEdit = QLineEdit(self.configGroupBox)
@@ -139,7 +201,12 @@ class Ui_Dialog(object):
         QWidget.setTabOrder(self.meshLocLineEdit, self.meshLocButton)
         QWidget.setTabOrder(self.meshLocButton, self.pathLocLineEdit)
         QWidget.setTabOrder(self.pathLocLineEdit, self.pathLocButton)
-        QWidget.setTabOrder(self.pathLocButton, self.buttonBox)
+        QWidget.setTabOrder(self.pathLocButton, self.asyncCheckBox)
+        QWidget.setTabOrder(self.asyncCheckBox, self.formatComboBox)
+        QWidget.setTabOrder(self.formatComboBox, self.precisionComboBox)
+        QWidget.setTabOrder(self.precisionComboBox, self.digitsSpinBox)
+        QWidget.setTabOrder(self.digitsSpinBox, self.compressionComboBox)
+        QWidget.setTabOrder(self.compressionComboBox, self.buttonBox)
 
         self.retranslateUi(Dialog)
         self.buttonBox.accepted.connect(Dialog.accept)
@@ -156,6 +223,26 @@ class Ui_Dialog(object):
         self.label2.setText(QCoreApplication.translate("Dialog", u"Ensemble Filename:  ", None))
         self.label3.setText(QCoreApplication.translate("Dialog", u"Mesh Filename:  ", None))
         self.label4.setText(QCoreApplication.translate("Dialog", u"Path:  ", None))
+        self.label5.setText(QCoreApplication.translate("Dialog", u"Asynchronous Write:  ", None))
+        self.asyncCheckBox.setText("")
+        self.label6.setText(QCoreApplication.translate("Dialog", u"Output Format:  ", None))
+        self.formatComboBox.setItemText(0, QCoreApplication.translate("Dialog", u"geof", None))
+        self.formatComboBox.setItemText(1, QCoreApplication.translate("Dialog", u"npz", None))
+        self.formatComboBox.setItemText(2, QCoreApplication.translate("Dialog", u"npy", None))
+
+        self.label7.setText(QCoreApplication.translate("Dialog", u"Precision:  ", None))
+        self.precisionComboBox.setItemText(0, QCoreApplication.translate("Dialog", u"float64", None))
+        self.precisionComboBox.setItemText(1, QCoreApplication.translate("Dialog", u"float32", None))
+        self.precisionComboBox.setItemText(2, QCoreApplication.translate("Dialog", u"fixed32", None))
+        self.precisionComboBox.setItemText(3, QCoreApplication.translate("Dialog", u"fixed16", None))
+
+        self.label8.setText(QCoreApplication.translate("Dialog", u"Significant Digits:  ", None))
+        self.digitsSpinBox.setSpecialValueText(QCoreApplication.translate("Dialog", u"full", None))
+        self.label9.setText(QCoreApplication.translate("Dialog", u"Compression:  ", None))
+        self.compressionComboBox.setItemText(0, QCoreApplication.translate("Dialog", u"none", None))
+        self.compressionComboBox.setItemText(1, QCoreApplication.translate("Dialog", u"gzip", None))
+        self.compressionComboBox.setItemText(2, QCoreApplication.translate("Dialog", u"bz2", None))
+        self.compressionComboBox.setItemText(3, QCoreApplication.translate("Dialog", u"lzma", None))
         self.gfLocButton.setText(QCoreApplication.translate("Dialog", u"...", None))
         self.ensLocButton.setText(QCoreApplication.translate("Dialog", u"...", None))
         self.meshLocButton.setText(QCoreApplication.translate("Dialog", u"...", None))
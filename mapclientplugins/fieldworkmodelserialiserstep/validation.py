@@ -0,0 +1,51 @@
+"""
+Validation of the step configuration, shared by the configure dialog
+and by FieldworkModelSerialiserStep.deserialize. Has no Qt dependency,
+so workflows can be loaded and checked without a display.
+"""
+
+import os
+
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import is_object_url
+
+LOCATION_FIELDS = ('GF Filename', 'Ensemble Filename', 'Mesh Filename', 'Path')
+
+
+def output_location(location, workflowLocation=None):
+    """
+    Return location relative to the workflow if it is an absolute path,
+    otherwise unchanged.
+    """
+    if workflowLocation and os.path.isabs(location):
+        return os.path.relpath(location, workflowLocation)
+    return location
+
+
+def validate_config(config, workflowLocation, identifierOccursCount, previousIdentifier=''):
+    """
+    Check config and return (valid, fields), where fields maps
+    'identifier' and each of LOCATION_FIELDS to whether that value is
+    valid. The identifier must be unique in the workflow, which is
+    decided with the identifierOccursCount callable from the workflow
+    framework. Each location must be non-empty and name a file in (or
+    for Path, be) an existing directory, or be an s3:// object store
+    URL. The configuration is valid if the identifier and the GF
+    filename are valid.
+    """
+    identifier = config['identifier']
+    occurs = identifierOccursCount(identifier)
+    fields = {'identifier': (occurs == 0) or (occurs == 1 and previousIdentifier == identifier)}
+
+    for key in LOCATION_FIELDS:
+        text = config[key]
+        if is_object_url(text):
+            # Buckets are checked when the first model is uploaded.
+            fields[key] = True
+            continue
+        directory = text if key == 'Path' else os.path.dirname(text)
+        location = output_location(directory, workflowLocation)
+        if workflowLocation:
+            location = os.path.join(workflowLocation, location)
+        fields[key] = bool(os.path.exists(location) and len(text))
+
+    return fields['identifier'] and fields['GF Filename'], fields
@@ -0,0 +1,83 @@
+"""
+Write-behind support for the Fieldwork Model Serialiser Step.
+Saves are queued on a small pool of background threads so that
+execute can hand control back to the workflow without waiting on
+disk. The queue is bounded, so a workflow producing models faster
+than they can be written will block until a slot frees up.
+"""
+
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def snapshot_geometric_field(gf):
+    """
+    Return a shallow copy of gf that owns a copy of the nodal
+    parameters. The ensemble and mesh are shared, only the
+    parameters are expected to change between executions.
+    """
+    snapshot = copy.copy(gf)
+    snapshot.field_parameters = gf.field_parameters.copy()
+    return snapshot
+
+
+class BackgroundWriter(object):
+    """
+    Bounded write-behind queue. submit() blocks while max_pending
+    writes are outstanding. Exceptions raised by queued writes are
+    re-raised from the next submit() or flush().
+    """
+
+    def __init__(self, max_workers=1, max_pending=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='fieldwork-writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._errors = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.raise_errors()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                self._errors.append(future.exception())
+        self._slots.release()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Block until every queued write has completed, then raise the
+        first error encountered, if any.
+        """
+        with self._lock:
+            futures = list(self._pending)
+        wait(futures)
+        self.raise_errors()
+
+    def raise_errors(self):
+        with self._lock:
+            errors = self._errors
+            self._errors = []
+        if errors:
+            raise errors[0]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
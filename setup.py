@@ -32,4 +32,10 @@ setup(name=u'mapclientplugins.fieldworkmodelserialiserstep',
     include_package_data=True,
     zip_safe=False,
     install_requires=requires,
+    extras_require={'s3': ['boto3']},
+    entry_points={
+        'console_scripts': [
+            'fieldwork-serialise = mapclientplugins.fieldworkmodelserialiserstep.convert:main',
+        ],
+    },
     )
@@ -0,0 +1,71 @@
+"""
+Fixtures shared by the tests. Models are real gias3 GeometricFields, so
+the tests follow the filename handling of gias3 itself: tests that need
+a model are skipped when gias3 is not installed.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+
+def make_geometric_field(name='femur', seed=0, ensemble=None):
+    template_fields = pytest.importorskip('gias3.fieldwork.field.template_fields')
+    from gias3.fieldwork.field import geometric_field
+
+    ensemble = ensemble or template_fields.two_quad_patch()
+    gf = geometric_field.GeometricField(name, 3, ensemble_field_function=ensemble)
+    nodes = ensemble.get_number_of_ensemble_points()
+    gf.set_field_parameters(np.random.default_rng(seed).random((3, nodes, 1)))
+    return gf
+
+
+def load_geometric_field(geof, ens, mesh):
+    from gias3.fieldwork.field import geometric_field
+
+    return geometric_field.load_geometric_field(geof, ens, mesh)
+
+
+def make_step(location, config=None):
+    """
+    Return a FieldworkModelSerialiserStep writing femur.geof, .ens and
+    .mesh to location, with config applied over its defaults.
+    """
+    pytest.importorskip('mapclient.mountpoints.workflowstep')
+    from mapclientplugins.fieldworkmodelserialiserstep.step import FieldworkModelSerialiserStep
+
+    step = FieldworkModelSerialiserStep(location)
+    step.registerDoneExecution(lambda: None)
+    step._config.update({'identifier': 'test', 'GF Filename': 'femur', 'Ensemble Filename': 'femur',
+                         'Mesh Filename': 'femur', 'Path': location})
+    step._config.update(config or {})
+    return step
+
+
+@pytest.fixture
+def gf():
+    return make_geometric_field()
+
+
+@pytest.fixture
+def cwd(tmp_path, monkeypatch):
+    """
+    An empty current directory, so that tests can check that nothing
+    is written relative to it.
+    """
+    directory = tmp_path / 'cwd'
+    directory.mkdir()
+    monkeypatch.chdir(directory)
+    return directory
+
+
+@pytest.fixture
+def out(tmp_path, cwd):
+    directory = tmp_path / 'out'
+    directory.mkdir()
+    return str(directory)
+
+
+def listing(directory):
+    return sorted(os.listdir(directory))
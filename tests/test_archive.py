@@ -0,0 +1,114 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field, make_geometric_field, make_step
+from mapclientplugins.fieldworkmodelserialiserstep.archive import END_MAGIC, ArchiveReader, ModelArchive, \
+    stage_model
+from mapclientplugins.fieldworkmodelserialiserstep.durability import commit_all, get_group_commit
+
+
+def _load_record(archive, name, directory):
+    with ArchiveReader(archive) as reader:
+        members = reader.read(name)
+    for member, data in members.items():
+        with open(os.path.join(directory, member), 'wb') as f:
+            f.write(data)
+    return load_geometric_field(*(os.path.join(directory, 'femur' + e) for e in ('.geof', '.ens', '.mesh')))
+
+
+def test_staged_model_round_trip(gf, out, cwd, tmp_path):
+    commit_all()
+    archive = ModelArchive(os.path.join(out, 'models.fwa'))
+    result = stage_model(gf, 'femur', 'femur', 'femur', atomic=True, durability='group')
+    staging = result['staging']
+    assert archive.append_staged('femur', result) == 'femur'
+    archive.close()
+
+    assert not os.path.exists(staging)
+    assert listing(cwd) == []
+    assert get_group_commit().pending() == 0
+    loaded = _load_record(os.path.join(out, 'models.fwa'), 'femur', str(tmp_path))
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_unflushed_records_are_recovered(out, cwd):
+    filename = os.path.join(out, 'models.fwa')
+    archive = ModelArchive(filename, flushEvery=100)
+    for i in range(3):
+        archive.append_staged('femur', stage_model(make_geometric_field(seed=i), 'femur', 'femur', 'femur'))
+    # Simulate a writer that died before writing the index footer.
+    archive._f.flush()
+    archive._f.close()
+    with open(filename, 'rb') as f:
+        assert END_MAGIC not in f.read()[-len(END_MAGIC):]
+
+    with ArchiveReader(filename) as reader:
+        assert reader.names() == ['femur', 'femur@1', 'femur@2']
+
+    archive = ModelArchive(filename)
+    assert archive.append('femur', []) == 'femur@3'
+    archive.close()
+
+
+def test_partial_last_record_is_dropped(gf, out, cwd):
+    filename = os.path.join(out, 'models.fwa')
+    archive = ModelArchive(filename, flushEvery=100)
+    archive.append_staged('first', stage_model(gf, 'femur', 'femur', 'femur'))
+    archive.append_staged('second', stage_model(gf, 'femur', 'femur', 'femur'))
+    archive._f.flush()
+    size = archive._f.tell()
+    archive._f.truncate(size - 10)
+    archive._f.close()
+
+    with ArchiveReader(filename) as reader:
+        assert reader.names() == ['first']
+
+
+def test_step_appends_many_models_to_archive(gf, out, cwd, tmp_path):
+    # Default config, so staged files would be group committed if they
+    # were not kept out of the group.
+    step = make_step(out, {'Archive': os.path.join(out, 'models.fwa')})
+    step.setPortData(0, gf)
+    for i in range(70):
+        step.execute()
+    step.flush()
+
+    assert listing(cwd) == []
+    with ArchiveReader(os.path.join(out, 'models.fwa')) as reader:
+        assert len(reader.names()) == 70
+    loaded = _load_record(os.path.join(out, 'models.fwa'), 'femur@69', str(tmp_path))
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_record_torn_over_an_old_footer_is_dropped(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'models.fwa')
+    good, payload = tmp_path / 'good.bin', tmp_path / 'payload.bin'
+    good.write_bytes(b'GOOD')
+    payload.write_bytes(b'GOODGOODGO' + b'x' * 90)
+    archive = ModelArchive(filename, flushEvery=1000)
+    for i in range(200):
+        archive.append('model{}'.format(i), [str(good)])
+    archive.flush()
+
+    def torn(source, target):
+        target.write(source.read(10))
+        target.flush()
+        raise SystemExit('crashed')
+
+    monkeypatch.setattr(shutil, 'copyfileobj', torn)
+    with pytest.raises(SystemExit):
+        archive.append('torn', [str(payload)])
+    archive._f.close()
+    monkeypatch.undo()
+
+    with ArchiveReader(filename) as reader:
+        assert reader.names() == ['model{}'.format(i) for i in range(200)]
+    archive = ModelArchive(filename)
+    assert archive.append('model0', [str(payload)]) == 'model0@1'
+    archive.close()
+    with ArchiveReader(filename) as reader:
+        assert reader.read('model0@1') == {'payload.bin': payload.read_bytes()}
+        assert reader.read('model199') == {'good.bin': b'GOOD'}
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field, make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.batch import save_batch
+
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+def test_batch_writes_every_model(out, cwd, pool):
+    models = dict((name, make_geometric_field(seed=seed)) for seed, name in enumerate(('a', 'b', 'c')))
+    results, summary = save_batch(models, 'femur', 'femur', 'femur', out, '{filename}_{name}',
+                                  workers=2, pool=pool, atomic=True, durability='group')
+
+    assert summary['models'] == 3 and summary['failed'] == 0
+    assert listing(out) == sorted('femur_{}{}'.format(n, e) for n in 'abc' for e in ('.ens', '.geof', '.mesh'))
+    assert listing(cwd) == []
+    for name, gf in models.items():
+        loaded = load_geometric_field(*results[name]['files'])
+        np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_failed_models_are_reported(out):
+    models = [make_geometric_field(), None]
+    results, summary = save_batch(models, 'femur', None, None, out, '{filename}_{index}')
+
+    assert summary['failed'] == 1
+    assert 'error' in results['1'] and 'error' not in results['0']
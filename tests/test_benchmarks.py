@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+def test_every_serialise_mode_runs(tmp_path, cwd):
+    sys.path.insert(0, BENCHMARKS)
+    try:
+        from serialise import MODES
+    finally:
+        sys.path.remove(BENCHMARKS)
+    output = str(tmp_path / 'results.json')
+
+    subprocess.check_call([sys.executable, os.path.join(BENCHMARKS, 'serialise.py'), '--nodes', '50',
+                           '--repeat', '2', '--output', output], stderr=subprocess.DEVNULL)
+    with open(output) as f:
+        results = json.load(f)['results']
+    assert sorted(r['mode'] for r in results) == sorted(MODES)
+    assert all(r['bytes_written'] > 0 for r in results)
+    assert os.listdir(str(cwd)) == []
+
+
+def test_compression_benchmark_reads_every_synthetic_file(tmp_path, cwd):
+    output = str(tmp_path / 'results.json')
+
+    subprocess.check_call([sys.executable, os.path.join(BENCHMARKS, 'compression.py'), '--nodes', '100',
+                           '--levels', '1', '--output', output], stderr=subprocess.DEVNULL)
+    with open(output) as f:
+        results = json.load(f)['results']
+    assert results and all(r['files'] == 3 for r in results)
+    assert os.listdir(str(cwd)) == []
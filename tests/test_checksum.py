@@ -0,0 +1,64 @@
+import hashlib
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mapclientplugins.fieldworkmodelserialiserstep import checksum
+from mapclientplugins.fieldworkmodelserialiserstep.checksum import read_sidecar, verify, verify_tree
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+
+def _sha256(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.mark.parametrize('fmt,atomic', [('geof', False), ('geof', True), ('npz', True), ('npy', False)])
+def test_digests_computed_while_writing_match_the_files(gf, out, fmt, atomic):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, fmt=fmt, atomic=atomic, checksum='sha256')
+
+    assert sorted(result['sidecars']) == sorted(f + '.sha256' for f in result['files'])
+    for f in result['files']:
+        assert result['checksums'][f] == _sha256(f)
+        assert read_sidecar(f + '.sha256') == (_sha256(f), os.path.getsize(f), os.stat(f).st_mtime_ns)
+    assert set(verify_tree(out, full=True).values()) == {'ok'}
+
+
+@pytest.mark.skipif(shutil.which('sha256sum') is None, reason='needs sha256sum')
+def test_sidecars_check_with_sha256sum(gf, out):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, checksum='sha256')
+    subprocess.check_call(['sha256sum', '--quiet', '-c'] + [os.path.basename(s) for s in result['sidecars']],
+                          cwd=out)
+
+
+def test_unchanged_files_are_not_read(gf, out, monkeypatch):
+    save_model(gf, 'femur', 'femur', 'femur', out, checksum='sha256')
+
+    def fail(filename, algorithm):
+        raise AssertionError('read ' + filename)
+
+    monkeypatch.setattr(checksum, 'file_checksum', fail)
+    assert set(verify_tree(out).values()) == {'unchanged'}
+
+
+def test_changed_and_missing_files(gf, out):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, checksum='sha256')
+    geof, ens, mesh = result['files']
+
+    # Same size and modification time: only a full check reads the file.
+    stat = os.stat(geof)
+    with open(geof, 'r+b') as f:
+        f.write(b'[')
+    os.utime(geof, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert verify(geof) == 'unchanged'
+    assert verify(geof, full=True) == 'mismatch'
+
+    with open(ens, 'ab') as f:
+        f.write(b'\n')
+    assert verify(ens) == 'mismatch'
+
+    os.remove(mesh)
+    assert verify(mesh) == 'missing'
+    assert verify_tree(out) == {geof: 'unchanged', ens: 'mismatch', mesh: 'missing'}
@@ -0,0 +1,33 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.compression import COMPRESSIONS, detect_compression, \
+    uncompressed
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+
+@pytest.mark.parametrize('compression', [c for c in COMPRESSIONS if c != 'none'])
+@pytest.mark.parametrize('atomic', [False, True])
+def test_compressed_model_round_trip(gf, out, cwd, compression, atomic):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, compression=compression, atomic=atomic)
+
+    assert listing(cwd) == []
+    assert len(listing(out)) == 3
+    for f in result['files']:
+        assert detect_compression(f) == compression
+    with uncompressed(*result['files']) as files:
+        loaded = load_geometric_field(*files)
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_compressed_geof_matches_uncompressed(gf, out, cwd):
+    plain = save_model(gf, 'plain', path=out)
+    packed = save_model(gf, 'packed', path=out, compression='gzip')
+    with open(plain['files'][0], 'rb') as f, gzip.open(packed['files'][0], 'rb') as g:
+        text = f.read()
+        assert g.read() == text
+    assert os.path.getsize(packed['files'][0]) < len(text)
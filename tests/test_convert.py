@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field, make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.convert import main
+from mapclientplugins.fieldworkmodelserialiserstep.formats import load_parameters
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    models = tmp_path / 'models'
+    (models / 'left').mkdir(parents=True)
+    gfs = {}
+    for name, seed in (('femur', 0), ('left/tibia', 1)):
+        gfs[name] = make_geometric_field(seed=seed)
+        save_model(gfs[name], name, name, name, str(models))
+    return str(models), gfs
+
+
+def test_tree_is_converted_into_a_mirror(tree, tmp_path, cwd):
+    models, gfs = tree
+    converted = str(tmp_path / 'converted')
+
+    assert main([models, converted, '--format', 'npy', '--workers', '2']) == 0
+    assert listing(converted) == ['femur.ens', 'femur.json', 'femur.mesh', 'femur.npy', 'left']
+    assert listing(os.path.join(converted, 'left')) == ['tibia.ens', 'tibia.json', 'tibia.mesh', 'tibia.npy']
+    params, header = load_parameters(os.path.join(converted, 'left', 'tibia.npy'))
+    np.testing.assert_array_equal(params, gfs['left/tibia'].field_parameters)
+    assert listing(cwd) == []
+
+    # Everything is now up to date.
+    assert main([models, converted, '--format', 'npy', '--dry-run']) == 0
+
+
+def test_geof_conversion_round_trips(tree, tmp_path):
+    models, gfs = tree
+    converted = str(tmp_path / 'converted')
+
+    assert main([models, converted, '--digits', '8', '--workers', '1']) == 0
+    loaded = load_geometric_field(*(os.path.join(converted, 'femur' + e) for e in ('.geof', '.ens', '.mesh')))
+    np.testing.assert_allclose(loaded.field_parameters, gfs['femur'].field_parameters, rtol=1e-7)
+
+
+def test_command_runs_without_mapclient(tree, tmp_path):
+    models, _ = tree
+    converted = str(tmp_path / 'converted')
+    script = ("import sys; sys.modules['mapclient'] = None; "
+              "from mapclientplugins.fieldworkmodelserialiserstep.convert import main; "
+              "sys.exit(main(sys.argv[1:]))")
+
+    subprocess.check_call([sys.executable, '-c', script, models, converted, '--workers', '1'], cwd=ROOT,
+                          stderr=subprocess.DEVNULL)
+    assert listing(converted) == ['femur.ens', 'femur.geof', 'femur.mesh', 'left']
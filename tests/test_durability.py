@@ -0,0 +1,40 @@
+import os
+import shutil
+
+from mapclientplugins.fieldworkmodelserialiserstep.durability import GroupCommit, replace
+
+
+def test_group_commit_fills_and_commits(tmp_path):
+    group = GroupCommit(groupFiles=3, groupMillis=60000)
+    files = []
+    for i in range(3):
+        files.append(str(tmp_path / 'f{}'.format(i)))
+        with open(files[-1], 'w') as f:
+            f.write('x')
+        group.add(files[-1:])
+    assert group.commits == 1
+    assert group.pending() == 0
+
+
+def test_group_commit_skips_removed_files_and_directories(tmp_path):
+    staging = tmp_path / 'staging'
+    staging.mkdir()
+    (staging / 'model.geof').write_text('x')
+    (tmp_path / 'kept.geof').write_text('x')
+
+    group = GroupCommit(groupFiles=100, groupMillis=60000)
+    group.add([str(staging / 'model.geof'), str(tmp_path / 'kept.geof')])
+    shutil.rmtree(str(staging))
+    group.commit()
+    assert group.commits == 1
+    assert group.pending() == 0
+
+
+def test_replace_overwrites_target(tmp_path):
+    staged = tmp_path / 'staged'
+    target = tmp_path / 'target'
+    staged.write_text('new')
+    target.write_text('old')
+    replace(str(staged), str(target))
+    assert target.read_text() == 'new'
+    assert not os.path.exists(str(staged))
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import listing
+from mapclientplugins.fieldworkmodelserialiserstep.formats import load_parameters
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'npy'])
+def test_binary_parameters_round_trip(gf, out, fmt):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, fmt=fmt, chunkBytes=16)
+
+    params, header = load_parameters(result['files'][0])
+    np.testing.assert_array_equal(params, gf.field_parameters)
+    assert header['name'] == 'femur'
+    assert header['shape'] == list(gf.field_parameters.shape)
+    assert (header['ensemble'], header['mesh']) == ('femur.ens', 'femur.mesh')
+    assert 'femur.ens' in listing(out) and 'femur.mesh' in listing(out)
+
+
+def test_npy_parameters_are_memory_mapped(gf, out):
+    result = save_model(gf, 'femur', None, None, out, fmt='npy')
+
+    params, _ = load_parameters(result['files'][0])
+    assert isinstance(params, np.memmap) and not params.flags.writeable
+    params, _ = load_parameters(result['files'][0], mmap=False)
+    assert not isinstance(params, np.memmap)
+
+
+@pytest.mark.parametrize('precision,tolerance', [('float32', 1e-7), ('fixed32', 1e-9), ('fixed16', 2e-5)])
+def test_reduced_precision_is_recorded_and_restored(gf, out, precision, tolerance):
+    full = save_model(gf, 'full', None, None, out, fmt='npy')
+    reduced = save_model(gf, 'reduced', None, None, out, fmt='npy', precision=precision)
+
+    params, header = load_parameters(reduced['files'][0])
+    assert header['precision']['precision'] == precision
+    assert os.path.getsize(reduced['files'][0]) < os.path.getsize(full['files'][0])
+    np.testing.assert_allclose(params, gf.field_parameters, rtol=0, atol=tolerance)
+    stored, _ = load_parameters(reduced['files'][0], restore=False)
+    assert stored.dtype != np.float64
+
+
+def test_unknown_files_are_rejected(out):
+    with pytest.raises(ValueError):
+        load_parameters(os.path.join(out, 'femur.geof'))
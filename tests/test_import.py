@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_package_import_does_not_load_gui_modules():
+    pytest.importorskip('mapclient.mountpoints.workflowstep')
+    # Exits with status 1 if a GUI module was loaded.
+    subprocess.check_call([sys.executable, os.path.join('benchmarks', 'import_time.py'), '--repeat', '1'], cwd=ROOT,
+                          stdout=subprocess.DEVNULL)
+
+
+def test_package_imports_with_a_mapclient_stand_in():
+    # Modules put in sys.modules by hand, as the benchmarks do, have no spec.
+    script = ("import sys, types\n"
+              "for name in ('mapclient', 'mapclient.mountpoints', 'mapclient.mountpoints.workflowstep'):\n"
+              "    sys.modules[name] = types.ModuleType(name)\n"
+              "sys.modules['mapclient.mountpoints.workflowstep'].WorkflowStepMountPoint = object\n"
+              "import mapclientplugins.fieldworkmodelserialiserstep\n")
+    subprocess.check_call([sys.executable, '-c', script], cwd=ROOT)
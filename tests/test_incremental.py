@@ -0,0 +1,44 @@
+import os
+
+from conftest import make_geometric_field, make_step
+
+
+def _execute(step, gf):
+    step.setPortData(0, gf)
+    step.execute()
+    return step._fingerprints.hits, step._fingerprints.misses
+
+
+def test_unchanged_model_is_not_rewritten(out):
+    step = make_step(out, {'Incremental': True})
+    gf = make_geometric_field()
+    assert _execute(step, gf) == (0, 1)
+    geof = os.path.join(out, 'femur.geof')
+    mtime = os.stat(geof).st_mtime_ns
+
+    assert _execute(step, gf) == (1, 1)
+    assert os.stat(geof).st_mtime_ns == mtime
+    assert step.getPortData(7) == geof
+
+    gf.field_parameters[0, 0, 0] += 1e-3
+    assert _execute(step, gf) == (1, 2)
+    os.remove(os.path.join(out, 'femur.ens'))
+    assert _execute(step, gf) == (1, 3)
+    assert os.path.exists(os.path.join(out, 'femur.ens'))
+
+
+def test_fingerprints_survive_a_restart(out):
+    gf = make_geometric_field()
+    _execute(make_step(out, {'Incremental': True}), gf)
+    assert _execute(make_step(out, {'Incremental': True}), gf) == (1, 0)
+
+
+def test_changes_within_tolerance_are_skipped(out):
+    step = make_step(out, {'Incremental': True, 'Incremental Tolerance': 1e-3})
+    gf = make_geometric_field()
+    _execute(step, gf)
+
+    gf.field_parameters[0, 0, 0] += 1e-4
+    assert _execute(step, gf) == (1, 1)
+    gf.field_parameters[0, 0, 0] += 1e-2
+    assert _execute(step, gf) == (1, 2)
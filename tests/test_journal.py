@@ -0,0 +1,58 @@
+import os
+
+from conftest import make_geometric_field, make_step
+from mapclientplugins.fieldworkmodelserialiserstep.batch import save_batch
+from mapclientplugins.fieldworkmodelserialiserstep.journal import JOURNAL_FILENAME, WriteJournal, load_journal
+
+
+def _models():
+    return dict((name, make_geometric_field(seed=seed)) for seed, name in enumerate(('a', 'b', 'c', 'd')))
+
+
+def _export(models, out):
+    # A new journal each time, as after a restart.
+    results, _ = save_batch(models, 'femur', 'femur', 'femur', out, '{filename}_{name}',
+                            fingerprints=WriteJournal(), atomic=True)
+    return sorted(name for name, result in results.items() if not result.get('skipped'))
+
+
+def test_resumed_export_skips_completed_models(out):
+    models = _models()
+    assert _export(models, out) == ['a', 'b', 'c', 'd']
+    assert _export(models, out) == []
+
+    models['b'].field_parameters[0, 0, 0] += 1.0
+    os.remove(os.path.join(out, 'femur_c.mesh'))
+    with open(os.path.join(out, 'femur_d.geof'), 'ab') as f:
+        f.write(b' ')
+    assert _export(models, out) == ['b', 'c', 'd']
+    assert _export(models, out) == []
+
+
+def test_line_cut_short_is_written_again(out):
+    models = _models()
+    _export(models, out)
+    journal = os.path.join(out, JOURNAL_FILENAME)
+    with open(journal, 'rb') as f:
+        lines = f.read().splitlines(True)
+    last = load_journal(out)
+    with open(journal, 'wb') as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])
+
+    assert len(load_journal(out)) == len(last) - 1
+    assert len(_export(models, out)) == 1
+    assert load_journal(out).keys() == last.keys()
+
+
+def test_step_resumes_from_the_journal(out):
+    models = _models()
+    step = make_step(out, {'Resume': True})
+    step.setPortData(5, models)
+    step.execute()
+
+    restarted = make_step(out, {'Resume': True})
+    restarted.setPortData(5, models)
+    restarted.execute()
+    assert all(result.get('skipped') for result in restarted._batchResults.values())
+    assert restarted._fingerprints.hits == 4
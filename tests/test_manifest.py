@@ -0,0 +1,35 @@
+import os
+
+from conftest import make_geometric_field, make_step
+from mapclientplugins.fieldworkmodelserialiserstep.manifest import MANIFEST_FILENAME, find_models, load_manifest
+
+
+def test_written_models_are_listed(out):
+    step = make_step(out, {'Manifest': True, 'Checksum': 'sha256'})
+    step.setPortData(0, make_geometric_field())
+    step.setPortData(5, {'a': make_geometric_field(seed=1), 'b': make_geometric_field(seed=2)})
+    step.execute()
+
+    entries = load_manifest(out)
+    assert sorted(entries) == ['femur.geof', 'femur_a.geof', 'femur_b.geof']
+    entry = entries['femur_a.geof']
+    assert entry['files'] == ['femur_a.geof', 'femur_a.ens', 'femur_a.mesh']
+    assert (entry['ensemble'], entry['mesh']) == ('femur_a.ens', 'femur_a.mesh')
+    assert entry['bytes'] == sum(os.path.getsize(os.path.join(out, f)) for f in entry['files'])
+    assert sorted(entry['checksums']) == sorted(entry['files'])
+    assert [e['filename'] for e in find_models(out, mesh='femur_b.mesh')] == ['femur_b.geof']
+    assert len(find_models(out, nodes=lambda n: n > 0)) == 3
+
+
+def test_later_entries_replace_earlier_ones(out):
+    step = make_step(out, {'Manifest': True})
+    gf = make_geometric_field()
+    step.setPortData(0, gf)
+    step.execute()
+    first = load_manifest(out)['femur.geof']['parameter_sha256']
+    gf.field_parameters[0, 0, 0] += 1.0
+    step.execute()
+
+    with open(os.path.join(out, MANIFEST_FILENAME)) as f:
+        assert len(f.readlines()) == 2
+    assert load_manifest(out)['femur.geof']['parameter_sha256'] != first
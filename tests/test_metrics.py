@@ -0,0 +1,31 @@
+import json
+import os
+
+from conftest import make_geometric_field, make_step
+
+
+def _records(location):
+    with open(os.path.join(location, 'metrics.jsonl')) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_each_write_is_recorded(out, tmp_path):
+    step = make_step(str(tmp_path), {'Metrics File': 'metrics.jsonl', 'Path': out, 'Asynchronous Write': True})
+    step.setPortData(0, make_geometric_field())
+    step.execute()
+    step.setPortData(5, [make_geometric_field(seed=1)])
+    step.setPortData(0, None)
+    step.execute()
+    step.flush()
+
+    # The asynchronous write may complete after the batch.
+    records = _records(str(tmp_path))
+    single, = [r for r in records if 'queue_wait' in r]
+    batch, = [r for r in records if 'batch' in r]
+    summary, = [r for r in records if r.get('batch_summary')]
+    assert single['step'] == 'test' and single['nodes'] == 9
+    assert single['queue_wait'] >= 0
+    assert sorted(os.path.basename(f['path']) for f in single['files']) == ['femur.ens', 'femur.geof', 'femur.mesh']
+    assert single['bytes'] == sum(f['bytes'] for f in single['files'])
+    assert batch['batch'] == '0'
+    assert summary['models'] == 1
@@ -0,0 +1,98 @@
+"""
+Uploads to a local moto S3 server, standing in for any S3-compatible
+object store.
+"""
+
+import gzip
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.objectstore import ObjectStoreSink
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+BUCKET = 'models'
+PART_BYTES = 5 << 20
+
+
+@pytest.fixture(scope='module')
+def endpoint():
+    pytest.importorskip('boto3')
+    server_module = pytest.importorskip('moto.server')
+    server = server_module.ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield 'http://{}:{}'.format(host, port)
+    server.stop()
+
+
+@pytest.fixture
+def client(endpoint, monkeypatch):
+    import boto3
+
+    for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    client = boto3.session.Session().client('s3', endpoint_url=endpoint)
+    client.create_bucket(Bucket=BUCKET)
+    yield client
+    for item in client.list_objects_v2(Bucket=BUCKET).get('Contents', []):
+        client.delete_object(Bucket=BUCKET, Key=item['Key'])
+    client.delete_bucket(Bucket=BUCKET)
+
+
+def _download(client, key, directory):
+    filename = os.path.join(directory, os.path.basename(key))
+    client.download_file(BUCKET, key, filename)
+    return filename
+
+
+def test_model_upload_round_trip(gf, client, endpoint, cwd, tmp_path):
+    result = save_model(gf, 'femur', 'femur', 'femur', 's3://{}/population/'.format(BUCKET),
+                        endpoint=endpoint, checksum='sha256')
+
+    assert listing(cwd) == []
+    keys = sorted(item['Key'] for item in client.list_objects_v2(Bucket=BUCKET)['Contents'])
+    assert keys == sorted('population/femur' + e for e in ('.geof', '.ens', '.mesh', '.geof.sha256',
+                                                           '.ens.sha256', '.mesh.sha256'))
+    assert result['files'][0] == 's3://models/population/femur.geof'
+
+    files = [_download(client, 'population/femur' + e, str(tmp_path)) for e in ('.geof', '.ens', '.mesh')]
+    loaded = load_geometric_field(*files)
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+    with open(files[0], 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == result['checksums'][result['files'][0]]
+
+
+def test_compressed_model_upload(gf, client, endpoint, cwd, tmp_path):
+    save_model(gf, 'femur', 'femur', 'femur', 's3://{}'.format(BUCKET), endpoint=endpoint, compression='gzip')
+
+    assert listing(cwd) == []
+    geof = _download(client, 'femur.geof.gz', str(tmp_path))
+    with gzip.open(geof, 'rb') as f:
+        assert f.read().startswith(b'{')
+
+
+def test_single_and_multipart_uploads(client, endpoint, tmp_path):
+    small = tmp_path / 'small.bin'
+    large = tmp_path / 'large.bin'
+    small.write_bytes(os.urandom(1 << 10))
+    large.write_bytes(os.urandom(2 * PART_BYTES + 1234))
+
+    sink = ObjectStoreSink(endpoint, connections=4, partBytes=PART_BYTES)
+    try:
+        urls = ['s3://{}/small.bin'.format(BUCKET), 's3://{}/large.bin'.format(BUCKET)]
+        write = sink.upload([str(small), str(large)], urls)
+    finally:
+        sink.close()
+
+    assert write['sizes'] == [small.stat().st_size, large.stat().st_size]
+    assert write['bytes'] == sum(write['sizes'])
+    # S3 marks objects assembled from several parts with a part count in the ETag.
+    assert '-' not in client.head_object(Bucket=BUCKET, Key='small.bin')['ETag']
+    assert client.head_object(Bucket=BUCKET, Key='large.bin')['ETag'].strip('"').endswith('-3')
+    for name, source in (('small.bin', small), ('large.bin', large)):
+        assert client.get_object(Bucket=BUCKET, Key=name)['Body'].read() == source.read_bytes()
@@ -0,0 +1,101 @@
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from conftest import load_geometric_field, make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.processwriter import ProcessWriter
+
+
+@pytest.fixture
+def writer():
+    pytest.importorskip('gias3.fieldwork.field.template_fields')
+    writer = ProcessWriter(max_pending=2)
+    yield writer
+    writer.shutdown()
+
+
+def _block_names(writer):
+    blocks = []
+    while not writer._blocks.empty():
+        blocks.append(writer._blocks.get_nowait())
+    for block in blocks:
+        writer._blocks.put(block)
+    return [block.name for block in blocks if block is not None]
+
+
+def test_models_round_trip_through_shared_memory(writer, out):
+    gf = make_geometric_field()
+    expected = []
+    completed = []
+    futures = []
+    for i in range(5):
+        gf.field_parameters[:, i] = -i
+        expected.append(gf.field_parameters.copy())
+        # Changing gf straight after submit does not change what is written.
+        futures.append(writer.submit(gf, ('femur_{}'.format(i), 'femur', 'femur', out), {},
+                                     callback=lambda snapshot, result: completed.append(result['files'][0])))
+    gf.field_parameters[...] = 0
+    writer.flush()
+
+    assert writer.pending() == 0
+    assert sorted(completed) == sorted(os.path.join(out, 'femur_{}.geof'.format(i)) for i in range(5))
+    assert len(writer._templates) == 1
+    for i, future in enumerate(futures):
+        loaded = load_geometric_field(*future.result()['files'])
+        np.testing.assert_array_equal(loaded.field_parameters, expected[i])
+
+
+def test_only_recent_templates_are_kept(writer, out):
+    models = [make_geometric_field(seed=i) for i in range(5)]
+    for i, gf in enumerate(models):
+        writer.submit(gf, ('femur_{}'.format(i), 'femur_{}'.format(i), 'femur', out), {})
+        assert len(writer._templates) <= 2
+    # The first ensemble was forgotten, and is sent again.
+    future = writer.submit(models[0], ('femur_again', 'femur_again', 'femur', out), {})
+    writer.flush()
+
+    assert list(writer._templates) == [id(models[4].ensemble_field_function),
+                                       id(models[0].ensemble_field_function)]
+    loaded = load_geometric_field(*future.result()['files'])
+    np.testing.assert_array_equal(loaded.field_parameters, models[0].field_parameters)
+
+
+def test_errors_are_raised_from_flush(writer, out):
+    missing = os.path.join(out, 'missing')
+    future = writer.submit(make_geometric_field(), ('femur', None, None, missing), {})
+
+    with pytest.raises(FileNotFoundError):
+        writer.flush()
+    assert isinstance(future.exception(), FileNotFoundError)
+    # The writer carries on after a failed write.
+    writer.submit(make_geometric_field(), ('femur', None, None, out), {})
+    writer.flush()
+    assert os.path.exists(os.path.join(out, 'femur.geof'))
+
+
+def test_worker_death_fails_pending_writes(writer, out):
+    writer.submit(make_geometric_field(), ('femur', None, None, out), {})
+    writer.flush()
+    writer._process.kill()
+    writer._process.join()
+
+    with pytest.raises(RuntimeError, match='exited'):
+        writer.flush()
+    with pytest.raises(RuntimeError, match='exited'):
+        writer.submit(make_geometric_field(), ('tibia', None, None, out), {})
+
+
+def test_shutdown_unlinks_shared_memory(out):
+    pytest.importorskip('gias3.fieldwork.field.template_fields')
+    writer = ProcessWriter(max_pending=2)
+    writer.submit(make_geometric_field(), ('femur', None, None, out), {})
+    writer.flush()
+    names = _block_names(writer)
+    writer.shutdown()
+
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+
+from conftest import listing, load_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model, save_options
+
+
+def test_geof_written_under_path(gf, out, cwd):
+    result = save_model(gf, 'femur', 'femur', 'femur', out)
+
+    assert listing(out) == ['femur.ens', 'femur.geof', 'femur.mesh']
+    assert listing(cwd) == []
+    assert result['files'] == [os.path.join(out, 'femur' + e) for e in ('.geof', '.ens', '.mesh')]
+    loaded = load_geometric_field(*result['files'])
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_atomic_write_renames_into_place(gf, out, cwd):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, atomic=True, durability='file')
+
+    # No staging directory is left behind, and nothing lands in the cwd.
+    assert listing(out) == ['femur.ens', 'femur.geof', 'femur.mesh']
+    assert listing(cwd) == []
+    loaded = load_geometric_field(*result['files'])
+    np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
+
+
+def test_atomic_write_of_filenames_with_directories(gf, out, cwd):
+    os.makedirs(os.path.join(out, 'models'))
+    result = save_model(gf, 'models/femur', 'models/femur_ens', 'models/femur_mesh', out, atomic=True)
+
+    assert listing(os.path.join(out, 'models')) == ['femur.geof', 'femur_ens.ens', 'femur_mesh.mesh']
+    assert listing(cwd) == []
+    with open(result['files'][0]) as f:
+        assert json.load(f)['ensemble_field'] == 'femur_ens'
+
+
+def test_atomic_npy_header_refers_to_base_names(gf, out, cwd):
+    result = save_model(gf, 'femur', 'femur', 'femur', out, fmt='npy', atomic=True)
+
+    assert listing(out) == ['femur.ens', 'femur.json', 'femur.mesh', 'femur.npy']
+    with open(os.path.join(out, 'femur.json')) as f:
+        header = json.load(f)
+    assert (header['ensemble'], header['mesh']) == ('femur.ens', 'femur.mesh')
+    np.testing.assert_array_equal(np.load(result['files'][0]), gf.field_parameters)
+
+
+def test_save_options_default_to_atomic_group_commit():
+    options = save_options({})
+    assert options['atomic'] is True
+    assert options['durability'] == 'group'
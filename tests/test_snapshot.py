@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import listing, make_geometric_field, make_step
+from mapclientplugins.fieldworkmodelserialiserstep.snapshot import reconstruct, save_delta
+
+
+def _ports(step):
+    return [step.getPortData(i) for i in (7, 8, 9)]
+
+
+@pytest.mark.parametrize('fmt', ['geof', 'npy'])
+def test_step_deltas_reconstruct_each_iteration(out, fmt):
+    step = make_step(out, {'Snapshot Mode': True, 'Output Format': fmt})
+    gf = make_geometric_field()
+    step.setPortData(0, gf)
+    step.execute()
+    base = step.getPortData(7)
+
+    iterations = []
+    for iteration in range(3):
+        gf.field_parameters[:, iteration] += 1.0
+        step.execute()
+        iterations.append((step.getPortData(7), gf.field_parameters.copy()))
+    step.flush()
+
+    assert base == os.path.join(out, 'femur.' + fmt)
+    assert [f for f, _ in iterations] == [os.path.join(out, 'femur.{:06d}.delta.npz'.format(i)) for i in (1, 2, 3)]
+    ensemble, mesh = os.path.join(out, 'femur.ens'), os.path.join(out, 'femur.mesh')
+    for deltaFile, params in iterations:
+        np.testing.assert_array_equal(reconstruct(deltaFile, ensemble, mesh), params)
+    with np.load(iterations[-1][0]) as data:
+        assert data['indices'].tolist() == [0, 1, 2]
+
+
+def test_delta_holds_only_changed_nodes(tmp_path):
+    base = np.random.default_rng(0).random((3, 200000, 1))
+    params = base.copy()
+    params[1, [5, 70000, 199999], 0] = -1.0
+    np.save(str(tmp_path / 'base.npy'), base)
+    with open(str(tmp_path / 'base.json'), 'w') as f:
+        f.write('{}')
+
+    changed = save_delta(str(tmp_path / 'model.delta.npz'), str(tmp_path / 'base.npy'), base, params, 1)
+
+    assert changed == 3
+    assert os.path.getsize(str(tmp_path / 'model.delta.npz')) < 2000
+    np.testing.assert_array_equal(reconstruct(str(tmp_path / 'model.delta.npz')), params)
+
+
+def test_new_ensemble_starts_a_new_base(out):
+    step = make_step(out, {'Snapshot Mode': True, 'Output Format': 'npy'})
+    step.setPortData(0, make_geometric_field())
+    step.execute()
+    step.setPortData(0, make_geometric_field(seed=1))
+    step.setPortData(1, 'tibia')
+    step.execute()
+    step.flush()
+
+    assert not any(f.endswith('.delta.npz') for f in listing(out))
+    assert 'tibia.npy' in listing(out)
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from conftest import listing, make_geometric_field, make_step
+from mapclientplugins.fieldworkmodelserialiserstep.archive import ArchiveReader
+
+
+@pytest.mark.parametrize('process', [False, True])
+def test_path_ports_wait_for_writes_and_keep_the_writer(out, cwd, process):
+    step = make_step(out, {'Asynchronous Write': True, 'Writer Process': process})
+    try:
+        step.setPortData(0, make_geometric_field())
+        step.execute()
+        writer = step._writer
+
+        assert step.getPortData(7) == os.path.join(out, 'femur.geof')
+        assert step.getPortData(8) == os.path.join(out, 'femur.ens')
+        assert step.getPortData(9) == os.path.join(out, 'femur.mesh')
+        assert listing(out) == ['femur.ens', 'femur.geof', 'femur.mesh']
+        assert step._writer is writer
+
+        step.setPortData(1, 'tibia')
+        step.execute()
+        assert step.getPortData(7) == os.path.join(out, 'tibia.geof')
+        assert step._writer is writer
+    finally:
+        step.flush()
+    assert listing(cwd) == []
+
+
+def test_path_ports_index_the_archive_and_keep_it_open(out):
+    step = make_step(out, {'Archive': 'models.fwa'})
+    try:
+        step.setPortData(0, make_geometric_field())
+        step.execute()
+        archive = step._archive
+
+        assert step.getPortData(7) == os.path.join(out, 'models.fwa')
+        with ArchiveReader(os.path.join(out, 'models.fwa')) as reader:
+            assert reader.names() == ['femur']
+        assert step._archive is archive
+    finally:
+        step.flush()
+
+
+def test_path_ports_are_none_for_batch_only_executions(out):
+    step = make_step(out)
+    step.setPortData(0, make_geometric_field())
+    step.execute()
+    assert step.getPortData(7) == os.path.join(out, 'femur.geof')
+
+    step.setPortData(0, None)
+    step.setPortData(5, {'a': make_geometric_field(seed=1), 'b': make_geometric_field(seed=2)})
+    step.execute()
+    assert [step.getPortData(i) for i in (7, 8, 9)] == [None, None, None]
+    assert 'femur_a.geof' in listing(out)
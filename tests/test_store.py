@@ -0,0 +1,60 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from conftest import listing, load_geometric_field, make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+
+
+def test_shared_ensemble_is_stored_once(out, cwd):
+    first = make_geometric_field(seed=0)
+    second = make_geometric_field(seed=1, ensemble=first.ensemble_field_function)
+    store = os.path.join(out, 'store')
+
+    results = [save_model(gf, name, name, name, out, storeDir=store)
+               for name, gf in (('a', first), ('b', second))]
+
+    assert listing(cwd) == []
+    assert len(listing(store)) == 2
+    assert results[0]['ensemble'] == results[1]['ensemble']
+    assert os.path.samefile(os.path.join(out, 'a.ens'), results[0]['ensemble'])
+    loaded = load_geometric_field(*results[1]['files'])
+    np.testing.assert_array_equal(loaded.field_parameters, second.field_parameters)
+
+
+@pytest.mark.parametrize('linkMode', ['hardlink', 'symlink', 'none'])
+def test_stored_ensemble_is_named_in_the_geof(gf, out, linkMode):
+    result = save_model(gf, 'a', 'a_ens', 'a_mesh', out, storeDir=os.path.join(out, 'store'), linkMode=linkMode)
+
+    with open(result['files'][0]) as f:
+        ensembleField = json.load(f)['ensemble_field']
+    if linkMode == 'none':
+        assert ensembleField + '.ens' == result['ensemble']
+    else:
+        assert ensembleField == 'a_ens'
+        assert os.path.exists(os.path.join(out, ensembleField + '.ens'))
+
+
+def test_concurrent_stores_of_distinct_ensembles(out, cwd):
+    template_fields = pytest.importorskip('gias3.fieldwork.field.template_fields')
+    templates = (template_fields.two_quad_patch, template_fields.three_quad_patch)
+    models = [make_geometric_field(seed=i, ensemble=templates[i % 2]()) for i in range(8)]
+    store = os.path.join(out, 'store')
+
+    def save(index):
+        name = 'm{}'.format(index)
+        return save_model(models[index], name, name, name, out, storeDir=store, atomic=True)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(save, range(len(models))))
+
+    assert listing(cwd) == []
+    # Ensembles built from the same template share one stored copy.
+    assert len(set(r['ensemble'] for r in results)) == 2
+    for index, (gf, result) in enumerate(zip(models, results)):
+        assert result['ensemble'] == results[index % 2]['ensemble']
+        loaded = load_geometric_field(*result['files'])
+        np.testing.assert_array_equal(loaded.field_parameters, gf.field_parameters)
@@ -0,0 +1,97 @@
+import io
+import json
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import load_geometric_field, make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.serialiser import save_model
+from mapclientplugins.fieldworkmodelserialiserstep.streaming import geof_streamable, write_geof, write_npy
+
+
+def _gias_geof(gf, directory, ens='femur', mesh='femur'):
+    ensFilename = None if ens is None else os.path.join(directory, ens)
+    gf.save_geometric_field(os.path.join(directory, 'gias'), ensFilename, mesh, directory)
+    with open(os.path.join(directory, 'gias.geof'), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('chunkBytes', [1, 500, 4 << 20])
+def test_geof_is_byte_identical_to_gias3(tmp_path, chunkBytes):
+    template_fields = pytest.importorskip('gias3.fieldwork.field.template_fields')
+    gf = make_geometric_field(ensemble=template_fields.three_quad_patch())
+    expected = _gias_geof(gf, str(tmp_path))
+
+    f = io.BytesIO()
+    write_geof(f, gf, 'femur', chunkBytes)
+    assert f.getvalue() == expected
+
+
+def test_saved_geof_is_byte_identical_to_gias3(gf, out, tmp_path):
+    expected = _gias_geof(gf, str(tmp_path), ens=None, mesh=None)
+    ensExpected = _gias_geof(gf, str(tmp_path))
+
+    save_model(gf, 'femur', None, None, out, chunkBytes=64)
+    with open(os.path.join(out, 'femur.geof'), 'rb') as f:
+        assert f.read() == expected
+    save_model(gf, 'femur', 'femur', 'femur', out, chunkBytes=64)
+    with open(os.path.join(out, 'femur.geof'), 'rb') as f:
+        assert f.read() == ensExpected
+    with open(os.path.join(out, 'femur.ens'), 'rb') as f, open(os.path.join(str(tmp_path), 'femur.ens'), 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_geof_memory_is_bounded_by_the_chunk(tmp_path):
+    params = np.random.default_rng(0).random((3, 50000, 1))
+    gf = SimpleNamespace(name='femur', dimensions=3, ensemble_point_counter=0, field_parameters=params)
+
+    with open(str(tmp_path / 'femur.geof'), 'wb') as f:
+        tracemalloc.start()
+        write_geof(f, gf, chunkBytes=64 << 10)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # The whole text is about 8 MB.
+    assert os.path.getsize(str(tmp_path / 'femur.geof')) > 7 << 20
+    assert peak < 1 << 20
+
+
+def test_geof_keys_gias3_sorts_as_strings_are_not_streamed():
+    assert geof_streamable(np.zeros((3, 10, 1)))
+    assert not geof_streamable(np.zeros((11, 10, 1)))
+    assert not geof_streamable(np.zeros((3, 0, 1)))
+    assert not geof_streamable(np.zeros((3, 10)))
+
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_npy_is_byte_identical_to_numpy_save(order):
+    array = np.asarray(np.random.default_rng(0).random((3, 1000, 1)), order=order)
+    expected = io.BytesIO()
+    np.save(expected, array)
+
+    f = io.BytesIO()
+    write_npy(f, array, chunkBytes=100)
+    assert f.getvalue() == expected.getvalue()
+    f = io.BytesIO()
+    write_npy(f, array[:, ::3], chunkBytes=100)
+    expected = io.BytesIO()
+    np.save(expected, array[:, ::3])
+    assert f.getvalue() == expected.getvalue()
+
+
+def test_significant_digits_shorten_geof_and_are_recorded(gf, out):
+    full = save_model(gf, 'full', 'femur', 'femur', out)
+    short = save_model(gf, 'short', 'femur', 'femur', out, digits=6)
+
+    # Each number drops from 22 characters to 11.
+    recorded = len('    "significant_digits": 6,\n')
+    saved = 11 * gf.field_parameters.size - recorded
+    assert os.path.getsize(short['files'][0]) == os.path.getsize(full['files'][0]) - saved
+    with open(short['files'][0]) as f:
+        geof = json.load(f)
+    assert geof['significant_digits'] == 6
+    assert geof['field_parameters']['node 00000000']['dim 0'] == '{:.5E}'.format(gf.field_parameters[0, 0, 0])
+    loaded = load_geometric_field(*short['files'])
+    np.testing.assert_allclose(loaded.field_parameters, gf.field_parameters, rtol=5e-6)
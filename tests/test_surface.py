@@ -0,0 +1,70 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from mapclientplugins.fieldworkmodelserialiserstep.surface import save_surfaces
+
+POINTS = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0]])
+TRIANGLES = np.array([[0, 1, 2], [0, 2, 3]])
+
+
+@pytest.fixture
+def gf():
+    calls = []
+
+    def triangulate(discretisation, merge=False):
+        calls.append(discretisation)
+        return POINTS, TRIANGLES
+
+    return SimpleNamespace(name='square', triangulate=triangulate, calls=calls)
+
+
+def _split_header(filename, end):
+    with open(filename, 'rb') as f:
+        data = f.read()
+    index = data.index(end) + len(end)
+    return data[:index].decode('ascii'), data[index:]
+
+
+def test_gf_is_triangulated_once_for_every_format(gf, tmp_path):
+    files = save_surfaces(gf, str(tmp_path / 'square'), ('vtk', 'ply', 'stl'), (4, 4))
+
+    assert files == [str(tmp_path / 'square') + e for e in ('.vtk', '.ply', '.stl')]
+    assert gf.calls == [[4, 4]]
+
+
+def test_stl(gf, tmp_path):
+    filename, = save_surfaces(gf, str(tmp_path / 'square'), ('stl',))
+    assert os.path.getsize(filename) == 84 + 50 * len(TRIANGLES)
+    records = np.fromfile(filename, dtype=[('normal', '<f4', (3,)), ('corners', '<f4', (3, 3)),
+                                           ('attribute', '<u2')], offset=84)
+    np.testing.assert_array_equal(records['normal'], [[0, 0, 1], [0, 0, 1]])
+    np.testing.assert_array_equal(records['corners'], POINTS[TRIANGLES])
+
+
+def test_ply(gf, tmp_path):
+    filename, = save_surfaces(gf, str(tmp_path / 'square'), ('ply',))
+    header, body = _split_header(filename, b'end_header\n')
+    assert 'element vertex 4' in header and 'element face 2' in header
+    points = np.frombuffer(body[:POINTS.nbytes], dtype='<f8').reshape(-1, 3)
+    faces = np.frombuffer(body[POINTS.nbytes:], dtype=[('count', 'u1'), ('vertices', '<i4', (3,))])
+    np.testing.assert_array_equal(points, POINTS)
+    np.testing.assert_array_equal(faces['vertices'], TRIANGLES)
+    assert (faces['count'] == 3).all()
+
+
+def test_vtk(gf, tmp_path):
+    filename, = save_surfaces(gf, str(tmp_path / 'square'), ('vtk',))
+    header, body = _split_header(filename, b'POINTS 4 double\n')
+    assert header.splitlines()[1:] == ['square', 'BINARY', 'DATASET POLYDATA', 'POINTS 4 double']
+    np.testing.assert_array_equal(np.frombuffer(body[:POINTS.nbytes], dtype='>f8').reshape(-1, 3), POINTS)
+    polygons = body.split(b'\nPOLYGONS 2 8\n')[1]
+    np.testing.assert_array_equal(np.frombuffer(polygons[:32], dtype='>i4').reshape(-1, 4)[:, 1:], TRIANGLES)
+
+
+def test_unknown_format_writes_nothing(gf, tmp_path):
+    with pytest.raises(ValueError):
+        save_surfaces(gf, str(tmp_path / 'square'), ('vtk', 'obj'))
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from mapclientplugins.fieldworkmodelserialiserstep.validation import output_location, validate_config
+
+
+@pytest.fixture
+def config():
+    return {'identifier': 'serialiser', 'GF Filename': 'models/femur', 'Ensemble Filename': 'missing/femur',
+            'Mesh Filename': '', 'Path': 's3://bucket/models'}
+
+
+def test_locations_are_checked_against_the_workflow(tmp_path, config):
+    (tmp_path / 'models').mkdir()
+    valid, fields = validate_config(config, str(tmp_path), lambda identifier: 0)
+
+    assert valid
+    assert fields == {'identifier': True, 'GF Filename': True, 'Ensemble Filename': False,
+                      'Mesh Filename': False, 'Path': True}
+    config['GF Filename'] = 'elsewhere/femur'
+    assert not validate_config(config, str(tmp_path), lambda identifier: 0)[0]
+
+
+def test_identifier_must_be_unique(tmp_path, config):
+    (tmp_path / 'models').mkdir()
+    assert not validate_config(config, str(tmp_path), lambda identifier: 1)[0]
+    assert validate_config(config, str(tmp_path), lambda identifier: 1, previousIdentifier='serialiser')[0]
+
+
+def test_absolute_locations_are_made_relative(tmp_path):
+    assert output_location(str(tmp_path / 'models'), str(tmp_path)) == 'models'
+    assert output_location('models', str(tmp_path)) == 'models'
+    assert output_location(os.path.abspath('models')) == os.path.abspath('models')
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import make_geometric_field
+from mapclientplugins.fieldworkmodelserialiserstep.writer import BackgroundWriter, snapshot_geometric_field
+
+
+@pytest.fixture
+def writer():
+    writer = BackgroundWriter(max_workers=1, max_pending=1)
+    yield writer
+    writer.shutdown()
+
+
+def test_submit_blocks_while_the_queue_is_full(writer):
+    release = threading.Event()
+    writer.submit(release.wait)
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: (writer.submit(lambda: None), submitted.set()))
+    thread.start()
+
+    assert not submitted.wait(0.2)
+    assert writer.pending() == 1
+    release.set()
+    thread.join(5)
+    assert submitted.is_set()
+    writer.flush()
+    assert writer.pending() == 0
+
+
+def test_errors_are_raised_from_the_next_call(writer):
+    def fail():
+        raise OSError('disk full')
+
+    writer.submit(fail)
+    with pytest.raises(OSError, match='disk full'):
+        writer.flush()
+
+    writer.submit(fail)
+    while writer.pending():
+        time.sleep(0.01)
+    with pytest.raises(OSError, match='disk full'):
+        writer.submit(lambda: None)
+    writer.flush()
+
+
+def test_snapshot_owns_its_parameters():
+    gf = make_geometric_field()
+    snapshot = snapshot_geometric_field(gf)
+    expected = gf.field_parameters.copy()
+    gf.field_parameters[...] = 0
+
+    np.testing.assert_array_equal(snapshot.field_parameters, expected)
+    assert snapshot.ensemble_field_function is gf.ensemble_field_function